@@ -0,0 +1,61 @@
+"""
+Memory held by the AST of generated programs, per node and per 1k lines
+of source.
+
+    $ python -m benchmarks.ast_memory --sizes 1000 5000
+"""
+import argparse
+import sys
+import tracemalloc
+
+from cool.ast import Node
+from cool.lexer import tokenizer
+from cool.parser import CoolParser
+from cool.pipeline import node_fields
+
+from .workload import generate_program
+
+
+def node_sizes(ast):
+    # (Shallow size of the nodes and of the lists and tuples they hold)
+    nodes = size = 0
+    pending = [ ast ]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, Node):
+            nodes += 1
+            size += sys.getsizeof(value)
+            pending.extend(getattr(value, x) for x in node_fields(value.__class__))
+        elif isinstance(value, (list, tuple)):
+            size += sys.getsizeof(value)
+            pending.extend(value)
+    return nodes, size
+
+
+def measure(lines):
+    code = generate_program(lines)
+    lines = code.count('\n')
+    tokens = tokenizer(code)
+
+    tracemalloc.start()
+    ast = CoolParser.evaluate(tokens)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    nodes, size = node_sizes(ast)
+    return lines, nodes, size, allocated
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog='python -m benchmarks.ast_memory', description='Measure the memory of the AST.')
+    argparser.add_argument('--sizes', type=int, nargs='+', default=[ 1000, 5000 ], help='lines of the generated programs')
+    args = argparser.parse_args(argv)
+
+    print(f'{"lines":>7} {"nodes":>7} {"B/node":>7} {"nodes KiB/1k lines":>19} {"traced KiB/1k lines":>20}')
+    for lines in args.sizes:
+        lines, nodes, size, allocated = measure(lines)
+        print(f'{lines:7} {nodes:7} {size / nodes:7.1f} {size / 1024 / lines * 1000:19.1f} {allocated / 1024 / lines * 1000:20.1f}')
+
+
+if __name__ == '__main__':
+    main()
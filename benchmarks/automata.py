@@ -0,0 +1,98 @@
+"""
+Time of the subset construction of cmp.automata over the NFAs of token
+sets, against the previous construction that kept every subset as a set
+of State objects and searched the list of subsets for every move, and
+number of states before and after the minimization, keeping apart the
+states that match different patterns.
+
+    $ python -m benchmarks.automata --keywords 50 200
+
+The `cool` set is the rules of cool/lexer.py; the `keywords` sets add
+that many keywords and operators to them, as a lexer of a larger
+language would have.
+"""
+import argparse
+import builtins
+import keyword
+import re
+import time
+
+from cool.cmp.automata import State
+from cool.cmp.lexgen import nfa
+from cool.lexer import rules
+
+
+def legacy_to_deterministic(nfa_start, formatter=lambda x: str(x)):
+    closure = nfa_start.epsilon_closure
+    start = State(tuple(closure), any(s.final for s in closure), formatter)
+
+    closures = [ closure ]
+    states = [ start ]
+    pending = [ start ]
+
+    while pending:
+        state = pending.pop()
+        symbols = { symbol for s in state.state for symbol in s.transitions }
+
+        for symbol in symbols:
+            move = State.move_by_state(symbol, *state.state)
+            closure = State.epsilon_closure_by_state(*move)
+
+            if closure not in closures:
+                new_state = State(tuple(closure), any(s.final for s in closure), formatter)
+                closures.append(closure)
+                states.append(new_state)
+                pending.append(new_state)
+            else:
+                index = closures.index(closure)
+                new_state = states[index]
+
+            state.add_transition(symbol, new_state)
+
+    return start
+
+
+def token_set(keywords):
+    patterns = [ pattern for _, pattern in rules() ]
+    words = sorted(set(keyword.kwlist) | { x for x in dir(builtins) if x.isidentifier() })[:keywords]
+    operators = [ '==', '!=', '>=', '>>', '<<', '**', '//', '->', '+=', '-=', '*=', '/=', '&&', '||', '::', '...' ]
+    return [ re.escape(x) for x in words + operators ] + patterns
+
+
+def measure(start, function, repeat):
+    best = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = function(start)
+        elapsed = time.perf_counter() - begin
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog='python -m benchmarks.automata', description='Benchmark the subset construction.')
+    argparser.add_argument('--keywords', type=int, nargs='+', default=[ 50, 200 ], help='keywords added to the COOL rules')
+    argparser.add_argument('--repeat', type=int, default=3, help='runs per set, the best time is kept')
+    args = argparser.parse_args(argv)
+
+    sets = [ ('cool', [ pattern for _, pattern in rules() ]) ] + [ (f'keywords {x}', token_set(x)) for x in args.keywords ]
+    print(f'{"set":>13} {"patterns":>8} {"NFA":>6} {"DFA":>6} {"min":>5} {"legacy ms":>10} {"bitset ms":>10} {"minimize ms":>12} {"speedup":>8}')
+    for name, patterns in sets:
+        start, finals, _ = nfa(patterns)
+        states = len(list(start))
+
+        def label(state):
+            # (The first pattern matched, as the lexer tells them apart)
+            return min((finals[x] for x in state.state if x in finals), default=None)
+
+        legacy, _ = measure(start, legacy_to_deterministic, args.repeat)
+        bitset, dfa = measure(start, State.to_deterministic, args.repeat)
+        table = dfa.to_table(label)
+        minimization, minimized = measure(table, table.__class__.minimize, args.repeat)
+
+        print(f'{name:>13} {len(patterns):8} {states:6} {table.states:6} {minimized.states:5} '
+              f'{legacy * 1000:10.2f} {bitset * 1000:10.2f} {minimization * 1000:12.2f} {legacy / bitset:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Time of GrammarTools.compute_firsts and compute_follows against the
+previous fixed-point iteration over all the productions, on the COOL
+grammar and on generated grammars with long chains of nullable and
+mutually recursive nonterminals.
+
+    $ python -m benchmarks.first_follow --levels 20 80 200
+
+Both computations must give the same sets, otherwise it fails.
+"""
+import argparse
+import time
+
+from cool.cmp import Grammar, GrammarTools, ContainerSet
+from cool.parser import CoolGrammar
+
+
+class LegacyGrammarTools:
+    @staticmethod
+    def compute_local_first(firsts, alpha):
+        first_alpha = ContainerSet()
+
+        try:
+            alpha_is_epsilon = alpha.IsEpsilon
+        except:
+            alpha_is_epsilon = False
+
+        if alpha_is_epsilon:
+            first_alpha.set_epsilon()
+        else:
+            for symbol in alpha:
+                first_symbol = firsts[symbol]
+                first_alpha.update(first_symbol)
+                if not first_symbol.contains_epsilon:
+                    break
+            else:
+                first_alpha.set_epsilon()
+
+        return first_alpha
+
+    @staticmethod
+    def compute_firsts(G):
+        firsts = {}
+        change = True
+
+        for terminal in G.terminals:
+            firsts[terminal] = ContainerSet(terminal)
+        for nonterminal in G.nonTerminals:
+            firsts[nonterminal] = ContainerSet()
+
+        while change:
+            change = False
+            for production in G.Productions:
+                X = production.Left
+                alpha = production.Right
+                first_X = firsts[X]
+                try:
+                    first_alpha = firsts[alpha]
+                except:
+                    first_alpha = firsts[alpha] = ContainerSet()
+                local_first = LegacyGrammarTools.compute_local_first(firsts, alpha)
+                change |= first_alpha.hard_update(local_first)
+                change |= first_X.hard_update(local_first)
+
+        return firsts
+
+    @staticmethod
+    def compute_follows(G, firsts):
+        follows = {}
+        change = True
+        local_firsts = {}
+
+        for nonterminal in G.nonTerminals:
+            follows[nonterminal] = ContainerSet()
+        follows[G.startSymbol] = ContainerSet(G.EOF)
+
+        while change:
+            change = False
+            for production in G.Productions:
+                X = production.Left
+                alpha = production.Right
+                follow_X = follows[X]
+                for i, symbol in enumerate(alpha):
+                    if symbol.IsNonTerminal:
+                        follow_symbol = follows[symbol]
+                        beta = alpha[i + 1:]
+                        try:
+                            first_beta = local_firsts[beta]
+                        except KeyError:
+                            first_beta = local_firsts[beta] = LegacyGrammarTools.compute_local_first(firsts, beta)
+                        change |= follow_symbol.update(first_beta)
+                        if first_beta.contains_epsilon or len(beta) == 0:
+                            change |= follow_symbol.update(follow_X)
+
+        return follows
+
+
+def chain_grammar(levels):
+    """
+    An expression grammar of `levels` binary operators, each level with a
+    nullable tail and a parenthesized expression back at the top, declared
+    from the innermost level so the fixed point needs a pass per level
+    """
+    G = Grammar()
+    start = G.NonTerminal('S', True)
+    operators = G.Terminals(' '.join(f'op{i}' for i in range(levels)))
+    opar, cpar, atom = G.Terminals('( ) atom')
+    expressions = [ G.NonTerminal(f'E{i}') for i in range(levels + 1) ]
+    tails = [ G.NonTerminal(f'T{i}') for i in range(levels) ]
+
+    expressions[levels] %= atom
+    expressions[levels] %= opar + expressions[0] + cpar
+    for i in reversed(range(levels)):
+        expressions[i] %= expressions[i + 1] + tails[i]
+        tails[i] %= operators[i] + expressions[i + 1] + tails[i]
+        tails[i] %= G.Epsilon
+    start %= expressions[0]
+    return G
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog='python -m benchmarks.first_follow', description='Benchmark FIRST and FOLLOW.')
+    argparser.add_argument('--levels', type=int, nargs='+', default=[ 20, 80, 200 ], help='operator levels of the generated grammars')
+    argparser.add_argument('--repeat', type=int, default=3, help='runs per grammar, the best time is kept')
+    args = argparser.parse_args(argv)
+
+    grammars = [ ('cool', CoolGrammar) ] + [ (f'levels {x}', chain_grammar(x)) for x in args.levels ]
+    print(f'{"grammar":>11} {"productions":>11} {"legacy ms":>10} {"scc ms":>9} {"speedup":>8}')
+    for name, G in grammars:
+        def legacy():
+            firsts = LegacyGrammarTools.compute_firsts(G)
+            return firsts, LegacyGrammarTools.compute_follows(G, firsts)
+
+        def scc():
+            firsts = GrammarTools.compute_firsts(G)
+            return firsts, GrammarTools.compute_follows(G, firsts)
+
+        before, expected = best_time(legacy, args.repeat)
+        after, result = best_time(scc, args.repeat)
+        if result != expected:
+            raise ValueError(f'FIRST or FOLLOW of {name} differ from the fixed point')
+        print(f'{name:>11} {len(G.Productions):11} {before * 1000:10.2f} {after * 1000:9.2f} {before / after:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
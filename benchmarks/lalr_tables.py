@@ -0,0 +1,67 @@
+"""
+Compares the canonical LR(1) and the LALR(1) tables of the COOL grammar:
+number of states, build time and memory held by `action`/`goto`.
+
+    $ python -m benchmarks.lalr_tables
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from cool.cmp import LR1Parser, LALR1Parser
+from cool.parser import CoolGrammar
+
+
+def table_size(table):
+    # containers of the table only, symbols and productions are shared with the grammar
+    size = sys.getsizeof(table)
+    for row in table.values():
+        size += sys.getsizeof(row)
+        for cell in row.values():
+            size += sys.getsizeof(cell)
+            size += sum(sys.getsizeof(x) for x in cell if isinstance(x, tuple))
+    return size
+
+
+def cached_size(parser):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        parser.save_parsing_table(cache_dir)
+        return os.path.getsize(parser.table_path(cache_dir))
+
+
+def measure(parser_type):
+    tracemalloc.start()
+    start = time.perf_counter()
+    parser = parser_type(CoolGrammar)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    states = sum(1 for _ in parser.automaton)
+    cells = sum(len(row) for row in parser.action.values()) + sum(len(row) for row in parser.goto.values())
+    conflicts = sum(len(cell) > 1 for row in parser.action.values() for cell in row.values())
+
+    return {
+        'parser': parser_type.__name__,
+        'states': states,
+        'build_s': elapsed,
+        'peak_build_kb': peak / 1024,
+        'cells': cells,
+        'table_kb': (table_size(parser.action) + table_size(parser.goto)) / 1024,
+        'cached_kb': cached_size(parser) / 1024,
+        'conflicts': conflicts,
+    }
+
+
+def main():
+    rows = [ measure(LR1Parser), measure(LALR1Parser) ]
+    columns = list(rows[0])
+    print(' '.join(f'{c:>14}' for c in columns))
+    for row in rows:
+        print(' '.join(f'{v:>14.3f}' if isinstance(v, float) else f'{v:>14}' for v in row.values()))
+
+
+if __name__ == '__main__':
+    main()
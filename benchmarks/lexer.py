@@ -0,0 +1,59 @@
+"""
+Tokens per second of the DFA lexer generated by cmp.lexgen against the
+ply lexer of the same rules, over generated programs.
+
+    $ python -m benchmarks.lexer --sizes 2000 8000
+
+Both lexers must produce the same tokens, otherwise it fails.
+"""
+import argparse
+import sys
+import time
+
+from cool.lexer import DFALexer, lexer, rules, tokenize, tokenize_ply
+
+from .workload import generate_program
+
+
+def best_time(function, code, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = list(function(code))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, tokens
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog='python -m benchmarks.lexer', description='Benchmark the lexers.')
+    argparser.add_argument('--sizes', type=int, nargs='+', default=[ 2000, 8000 ], help='lines of the generated programs')
+    argparser.add_argument('--repeat', type=int, default=3, help='runs per size, the best time is kept')
+    args = argparser.parse_args(argv)
+
+    start = time.perf_counter()
+    DFALexer(rules())
+    generation = time.perf_counter() - start
+    print(f'DFA of {lexer.states} states over {lexer.width} character classes, generated in {generation * 1000:.1f} ms')
+
+    print(f'{"lines":>6} {"tokens":>8} {"lexer":>5} {"ms":>9} {"tokens/s":>10}')
+    for size in args.sizes:
+        code = generate_program(size)
+        dfa, tokens = best_time(tokenize, code, args.repeat)
+        try:
+            ply, expected = best_time(tokenize_ply, code, args.repeat)
+        except ImportError:
+            ply, expected = None, tokens
+        if [ (x.lex, x.token_type, x.line, x.column) for x in tokens ] != [ (x.lex, x.token_type, x.line, x.column) for x in expected ]:
+            raise ValueError(f'the lexers produce different tokens for size {size}')
+
+        lines = code.count('\n')
+        print(f'{lines:6} {len(tokens):8} {"dfa":>5} {dfa * 1000:9.2f} {len(tokens) / dfa:10.0f}')
+        if ply is not None:
+            print(f'{lines:6} {len(tokens):8} {"ply":>5} {ply * 1000:9.2f} {len(tokens) / ply:10.0f}  ({ply / dfa:.2f}x)')
+        else:
+            print('ply is not installed', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
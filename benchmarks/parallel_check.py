@@ -0,0 +1,66 @@
+"""
+Time of the check stage over a generated program with thousands of
+classes, serial and across several worker processes.
+
+    $ python -m benchmarks.parallel_check --classes 4000 --jobs 1 2 4 8
+
+The times include starting the pool and sending the context to the
+workers, so the speedup only shows once the program is large enough.
+"""
+import argparse
+import multiprocessing
+import os
+import time
+
+from cool.parallel import check
+from cool.pipeline import run
+
+from .workload import generate
+
+
+def measure(program, context, jobs, repeat, start_method):
+    best = None
+    errors = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        errors = check(program, context, jobs, start_method=start_method)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, errors
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog='python -m benchmarks.parallel_check', description='Benchmark the parallel type check.')
+    argparser.add_argument('--classes', type=int, default=4000)
+    argparser.add_argument('--jobs', type=int, nargs='+', default=None, help='worker counts to measure (default: 1 up to the CPUs)')
+    argparser.add_argument('--start-method', choices=multiprocessing.get_all_start_methods(), default=None)
+    argparser.add_argument('--repeat', type=int, default=3, help='runs per worker count, the best time is kept')
+    argparser.add_argument('--seed', type=int, default=0)
+    args = argparser.parse_args(argv)
+
+    cpus = os.cpu_count() or 1
+    jobs = args.jobs or sorted({ 1, 2, 4, cpus } - { x for x in (2, 4) if x > cpus })
+
+    code = generate(classes=args.classes, seed=args.seed)
+    result = build(code)
+
+    serial, expected = measure(result.ast, result.context, 1, args.repeat, args.start_method)
+    print(f'{args.classes} classes, {code.count(chr(10))} lines, {cpus} CPUs')
+    print(f'{"jobs":>5} {"ms":>9} {"speedup":>8}')
+    for count in jobs:
+        seconds, errors = (serial, expected) if count == 1 else measure(result.ast, result.context, count, args.repeat, args.start_method)
+        if errors != expected:
+            raise ValueError(f'{count} jobs report other errors than the serial check')
+        print(f'{count:5} {seconds * 1000:9.2f} {serial / seconds:7.2f}x')
+
+
+def build(code):
+    # (The checker only sets the static types, the program can be checked again)
+    result = run(code, inference=None)
+    if result.failed_stage:
+        raise ValueError(f'the generated program fails at {result.failed_stage}: {result.errors[:1]}')
+    return result
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Time of the incremental updates of cool.server.Document against a new
+Document of the whole text, over random sequences of edits on generated
+programs: literals changed in a method body, declared types changed and
+classes renamed as another one, which makes the context fail to build.
+
+    $ python -m benchmarks.server --sequences 10 --edits 12
+
+After every edit the diagnostics and the hover of every token must be
+the same as those of the new Document, otherwise it fails.
+"""
+import argparse
+import random
+import re
+import time
+
+from cool.server import Document
+
+from .workload import generate
+
+_LITERAL = re.compile(r'(?<![A-Za-z0-9_])\d+(?![A-Za-z0-9_])')
+_CLASS = re.compile(r'^class (C\d+)', re.M)
+
+
+def edit(text, rng):
+    """
+    `text` with a random edit, the original classes are restored at times
+    so the sequences go back to programs that build
+    """
+    kind = rng.randrange(4)
+    if kind == 0:
+        names = _CLASS.findall(text)
+        if len(set(names)) > 1:
+            # (Two classes with the same name, the context does not build)
+            source, target = rng.sample(sorted(set(names)), 2)
+            return re.sub(rf'^class {source}\b', f'class {target}', text, count=1, flags=re.M)
+    if kind == 1 and 'AUTO_TYPE' in text:
+        positions = [ m.start() for m in re.finditer('AUTO_TYPE', text) ]
+        start = rng.choice(positions)
+        return text[:start] + rng.choice([ 'Int', 'Object' ]) + text[start + len('AUTO_TYPE'):]
+    literals = list(_LITERAL.finditer(text))
+    if not literals:
+        return text
+    match = rng.choice(literals)
+    return text[:match.start()] + str(rng.randint(0, 99)) + text[match.end():]
+
+
+def hovers(document):
+    # (Every token that describes something, with the hover at its position)
+    positions = sorted({ (token.line, token.column)
+                         for segment in document.segments
+                         for declaration in segment.declarations
+                         for token, _ in document.describe(declaration) })
+    return [ (line, column, document.hover(line, column)) for line, column in positions ]
+
+
+def state(document):
+    return sorted(document.diagnostics()), hovers(document)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog='python -m benchmarks.server', description='Benchmark the incremental analysis of the language server.')
+    argparser.add_argument('--sequences', type=int, default=10, help='edit sequences, each over a new generated program')
+    argparser.add_argument('--edits', type=int, default=12, help='edits per sequence')
+    argparser.add_argument('--classes', type=int, default=12)
+    argparser.add_argument('--seed', type=int, default=0)
+    args = argparser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    incremental = fresh = 0.0
+    updates = failed = 0
+    for sequence in range(args.sequences):
+        original = generate(classes=args.classes, nesting=2, auto_density=0.6, seed=rng.randrange(10 ** 6))
+        text = original
+        document = Document('file:///program.cl', text)
+        for step in range(args.edits):
+            text = original if rng.random() < 0.2 else edit(text, rng)
+
+            start = time.perf_counter()
+            document.update(text)
+            middle = time.perf_counter()
+            expected = Document('file:///program.cl', text)
+            end = time.perf_counter()
+            incremental += middle - start
+            fresh += end - middle
+            updates += 1
+            failed += document.context is None
+
+            if state(document) != state(expected):
+                raise ValueError(f'sequence {sequence}, edit {step}: the incremental document differs from a new one')
+
+    print(f'{updates} updates ({failed} with a context that does not build)')
+    print(f'{"analysis":>11} {"ms/update":>10}')
+    print(f'{"new":>11} {fresh / updates * 1000:10.2f}')
+    print(f'{"incremental":>11} {incremental / updates * 1000:10.2f}  ({fresh / incremental:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
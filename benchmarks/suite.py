@@ -0,0 +1,134 @@
+"""
+Runs the pipeline over generated programs of several sizes and reports
+the time and peak memory of every stage.
+
+    $ python -m benchmarks.suite --sizes 500 2000 8000 --output baseline.json
+    $ python -m benchmarks.suite --sizes 500 2000 8000 --baseline baseline.json
+
+With --baseline the results are compared with a previous run and the
+stages that got slower or use more memory beyond --tolerance are
+reported, exiting with status 1.
+"""
+import argparse
+import json
+import platform
+import sys
+
+from cool.pipeline import run, STAGES
+
+from .ast_memory import node_sizes
+from .workload import generate_program
+
+
+def measure(code, repeat, inference):
+    """
+    Best time of `repeat` runs and peak memory of a traced run, per stage
+    """
+    best = {}
+    for _ in range(repeat):
+        result = run(code, inference=inference)
+        if result.failed_stage:
+            raise ValueError(f'the generated program fails at {result.failed_stage}: {result.errors[:1]}')
+        for stage in result.stages:
+            best[stage.name] = min(best.get(stage.name, stage.seconds), stage.seconds)
+
+    traced = run(code, trace_memory=True, inference=inference)
+    stages = { x.name: { 'seconds': best[x.name], 'peak': x.peak, 'items': x.items } for x in traced.stages }
+    _, ast_bytes = node_sizes(traced.ast)
+    return {
+        'lines': code.count('\n'),
+        'tokens': len(traced.tokens),
+        'ast_bytes': ast_bytes,
+        'seconds': sum(x['seconds'] for x in stages.values()),
+        'stages': stages,
+    }
+
+
+def compare(results, baseline, tolerance, min_seconds, min_bytes):
+    """
+    Regressions of `results` against `baseline` as readable lines
+    """
+    previous = { x['size']: x for x in baseline['results'] }
+    regressions = []
+    for current in results['results']:
+        old = previous.get(current['size'])
+        if old is None:
+            continue
+        for name in STAGES:
+            now, before = current['stages'].get(name), old['stages'].get(name)
+            if now is None or before is None:
+                continue
+            if now['seconds'] > before['seconds'] * (1 + tolerance) and now['seconds'] - before['seconds'] > min_seconds:
+                regressions.append(f'size {current["size"]}, {name}: {before["seconds"] * 1000:.2f} ms -> {now["seconds"] * 1000:.2f} ms')
+            if now['peak'] is not None and before['peak'] is not None and \
+                    now['peak'] > before['peak'] * (1 + tolerance) and now['peak'] - before['peak'] > min_bytes:
+                regressions.append(f'size {current["size"]}, {name}: peak {before["peak"] / 1024:.0f} KiB -> {now["peak"] / 1024:.0f} KiB')
+        if current['ast_bytes'] > old['ast_bytes'] * (1 + tolerance) and current['ast_bytes'] - old['ast_bytes'] > min_bytes:
+            regressions.append(f'size {current["size"]}, AST: {old["ast_bytes"] / 1024:.0f} KiB -> {current["ast_bytes"] / 1024:.0f} KiB')
+    return regressions
+
+
+def report(results):
+    print(f'{"size":>6} {"lines":>6} {"stage":>8} {"ms":>9} {"peak KiB":>9} {"items":>7}')
+    for current in results['results']:
+        for name, stage in current['stages'].items():
+            peak = '' if stage['peak'] is None else f'{stage["peak"] / 1024:.0f}'
+            print(f'{current["size"]:6} {current["lines"]:6} {name:>8} {stage["seconds"] * 1000:9.2f} {peak:>9} {stage["items"]:7}')
+        print(f'{current["size"]:6} {current["lines"]:6} {"total":>8} {current["seconds"] * 1000:9.2f} {"":>9} {"":>7}  AST {current["ast_bytes"] / 1024:.0f} KiB')
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description='Benchmark the compilation stages.')
+    argparser.add_argument('--sizes', type=int, nargs='+', default=[ 500, 2000, 8000 ], help='lines of the generated programs')
+    argparser.add_argument('--repeat', type=int, default=3, help='runs per size, the best time is kept')
+    argparser.add_argument('--inference', choices=('worklist', 'pass', 'constraints'), default='worklist')
+    argparser.add_argument('--depth', type=int, default=3, help='length of the inheritance chains')
+    argparser.add_argument('--methods', type=int, default=4, help='methods per class')
+    argparser.add_argument('--nesting', type=int, default=3, help='depth of the expressions')
+    argparser.add_argument('--auto-density', type=float, default=0.5, help='probability of declaring AUTO_TYPE')
+    argparser.add_argument('--auto-chain', type=int, default=3, help='length of the chains of calls between methods')
+    argparser.add_argument('--seed', type=int, default=0)
+    argparser.add_argument('--output', help='file to store the results as JSON')
+    argparser.add_argument('--baseline', help='results of a previous run to compare with')
+    argparser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative growth (default: 0.25)')
+    argparser.add_argument('--min-seconds', type=float, default=0.002, help='smaller time differences are ignored')
+    argparser.add_argument('--min-bytes', type=int, default=64 * 1024, help='smaller memory differences are ignored')
+    args = argparser.parse_args(argv)
+
+    parameters = { 'depth': args.depth, 'methods': args.methods, 'nesting': args.nesting,
+                   'auto_density': args.auto_density, 'auto_chain': args.auto_chain, 'seed': args.seed }
+    results = {
+        'python': platform.python_version(),
+        'inference': args.inference,
+        'parameters': parameters,
+        'results': [],
+    }
+    for size in args.sizes:
+        code = generate_program(size, **parameters)
+        current = measure(code, args.repeat, args.inference)
+        current['size'] = size
+        results['results'].append(current)
+
+    report(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('parameters') != parameters or baseline.get('inference') != args.inference:
+            print('warning: the baseline was generated with other parameters', file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance, args.min_seconds, args.min_bytes)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+        print('no regressions against the baseline')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Per-visit overhead of cmp.visitor, against the previous dispatcher that
+went through a wrapper function and scanned every target with
+`issubclass` when the class of the node had no exact target.
+
+    $ python -m benchmarks.visitor_dispatch
+"""
+import inspect
+import time
+
+from cool.ast import Program, ClassDeclaration, AttrDeclaration, FuncDeclaration, IfThenElse, WhileLoop, \
+    Block, LetIn, CaseOf, Assign, Unary, LessEqual, Less, Equal, Arithmetic, IsVoid, Complement, FunctionCall, \
+    MemberCall, New, Integer, Id, String, Bool, Plus, Not
+from cool.cmp import visitor, Token
+
+
+def legacy_on(param_name):
+    def f(fn):
+        return LegacyDispatcher(param_name, fn)
+    return f
+
+
+def legacy_when(param_type):
+    def f(fn):
+        frame = inspect.currentframe().f_back
+        dispatcher = frame.f_locals[fn.__name__]
+        if not isinstance(dispatcher, LegacyDispatcher):
+            dispatcher = dispatcher.dispatcher
+        dispatcher.add_target(param_type, fn)
+        def ff(*args, **kw):
+            return dispatcher(*args, **kw)
+        ff.dispatcher = dispatcher
+        return ff
+    return f
+
+
+class LegacyDispatcher:
+    def __init__(self, param_name, fn):
+        self.param_index = inspect.getfullargspec(fn).args.index(param_name)
+        self.targets = {}
+
+    def __call__(self, *args, **kw):
+        typ = args[self.param_index].__class__
+        d = self.targets.get(typ)
+        if d is not None:
+            return d(*args, **kw)
+        ans = [self.targets[k](*args, **kw) for k in self.targets.keys() if issubclass(typ, k)]
+        if len(ans) == 1:
+            return ans.pop()
+        return ans
+
+    def add_target(self, typ, target):
+        self.targets[typ] = target
+
+
+TARGETS = (Program, ClassDeclaration, AttrDeclaration, FuncDeclaration, IfThenElse, WhileLoop, Block, LetIn,
+           CaseOf, Assign, Unary, LessEqual, Less, Equal, Arithmetic, IsVoid, Complement, FunctionCall,
+           MemberCall, New, Integer, Id, String, Bool)
+
+
+def make_visitor(on, when):
+    # the targets of the passes in cool.semantic, Plus and Not have no exact target
+    class Visitor:
+        @on('node')
+        def visit(self, node):
+            pass
+
+        for target in TARGETS:
+            @when(target)
+            def visit(self, node):
+                return node
+
+    return Visitor()
+
+
+def measure(visitor_instance, node, visits):
+    start = time.perf_counter()
+    for _ in range(visits):
+        visitor_instance.visit(node)
+    return (time.perf_counter() - start) / visits
+
+
+def main(visits=200000):
+    one = Integer(Token('1', None))
+    nodes = {
+        'exact (Integer)': one,
+        'base class (Plus -> Arithmetic)': Plus(one, one),
+        'base class (Not -> Unary)': Not(one),
+    }
+    legacy = make_visitor(legacy_on, legacy_when)
+    cached = make_visitor(visitor.on, visitor.when)
+
+    print(f'{"node":34} {"legacy ns":>10} {"cached ns":>10} {"speedup":>8}')
+    for name, node in nodes.items():
+        before = measure(legacy, node, visits)
+        after = measure(cached, node, visits)
+        print(f'{name:34} {before * 1e9:10.0f} {after * 1e9:10.0f} {before / after:7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Synthetic COOL programs for the benchmarks.
+
+    $ python -m benchmarks.workload --classes 40 --depth 4 --methods 5 > program.cl
+"""
+import argparse
+import random
+
+
+class Generator:
+    """
+    Writes valid programs where:
+
+    classes      : number of classes besides Main
+    depth        : length of the inheritance chains
+    methods      : methods per class
+    nesting      : depth of the expressions of every method body
+    auto_density : probability of declaring AUTO_TYPE an attribute, param,
+                   return or let variable
+    auto_chain   : methods of a class are grouped in chains of this length
+                   where each one calls the previous, so inferring the last
+                   return needs the ones before
+    """
+    def __init__(self, classes=10, depth=3, methods=4, nesting=3, auto_density=0.5, auto_chain=3, seed=0):
+        self.classes = classes
+        self.depth = max(depth, 1)
+        self.methods = methods
+        self.nesting = nesting
+        self.auto_density = auto_density
+        self.auto_chain = max(auto_chain, 1)
+        self.rng = random.Random(seed)
+        self.variables = 0
+
+    def declared(self):
+        return 'AUTO_TYPE' if self.rng.random() < self.auto_density else 'Int'
+
+    def expression(self, depth, names):
+        """
+        An Int expression `depth` levels deep over the Int variables in `names`
+        """
+        rng = self.rng
+        if depth <= 0:
+            return rng.choice(names) if rng.random() < 0.7 else str(rng.randint(0, 99))
+
+        left = self.expression(depth - 1, names)
+        right = self.expression(rng.randint(0, depth - 1), names)
+        form = rng.randrange(7)
+        if form == 0:
+            return f'({left} + {right})'
+        if form == 1:
+            return f'({left} * {right})'
+        if form == 2:
+            return f'(if {left} < {right} then {left} else {right} fi)'
+        if form == 3:
+            self.variables += 1
+            name = f'v{self.variables}'
+            body = self.expression(depth - 1, names + [ name ])
+            return f'(let {name} : {self.declared()} <- {left} in {body})'
+        if form == 4:
+            return f'({{ {left}; {right}; }})'
+        if form == 5:
+            return f'(case {left} of i : Int => {right}; o : Object => 0; esac)'
+        return f'(~{left} - {right})'
+
+    def method(self, prefix, index, previous):
+        """
+        Lines of the method `<prefix>m<index>` and its number of params,
+        `previous` is the arity of the method it calls, None if it calls none
+        """
+        arity = self.rng.randint(1, 3)
+        params = [ f'p{i}' for i in range(arity) ]
+        attribute = f'{prefix}a'
+        names = params + [ attribute ]
+
+        lines = [
+            f'    {prefix}m{index}({", ".join(f"{p} : {self.declared()}" for p in params)}) : {self.declared()} {{',
+            '        {',
+            f'            {attribute} <- {self.expression(self.nesting, names)};',
+            f'            while 0 < {attribute} loop {attribute} <- {attribute} - 1 pool;',
+            f'            {prefix}b <- {prefix}b.concat("s");',
+        ]
+        result = self.expression(self.nesting, names)
+        if previous is not None:
+            args = ', '.join(self.expression(1, names) for _ in range(previous))
+            result = f'{prefix}m{index - 1}({args}) + {result}'
+        lines += [
+            f'            {result};',
+            '        }',
+            '    };',
+        ]
+        return lines, arity
+
+    def generate(self):
+        output = []
+        for k in range(self.classes):
+            parent = f'C{k - 1}' if k % self.depth else 'IO'
+            prefix = f'c{k}'
+            output.append(f'class C{k} inherits {parent} {{')
+            # (Attributes are not visible from the subclasses, every class has its own)
+            output.append(f'    {prefix}a : {self.declared()} <- 0;')
+            output.append(f'    {prefix}b : String <- "";')
+            previous = None
+            for index in range(self.methods):
+                if index % self.auto_chain == 0:
+                    previous = None
+                method, previous = self.method(prefix, index, previous)
+                output.extend(method)
+            output.append('};')
+            output.append('')
+
+        output.append('class Main inherits IO {')
+        output.append('    main() : Object { out_int(0) };')
+        output.append('};')
+        return '\n'.join(output) + '\n'
+
+
+def generate(**parameters):
+    return Generator(**parameters).generate()
+
+
+def generate_program(lines, seed=0, **parameters):
+    """
+    A program of about `lines` lines with the default parameters otherwise
+    """
+    sample = generate(classes=8, seed=seed, **parameters)
+    per_class = max(1, (sample.count('\n') - 3) / 8)
+    return generate(classes=max(1, round(lines / per_class)), seed=seed, **parameters)
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog='python -m benchmarks.workload', description='Generate a COOL program.')
+    argparser.add_argument('--classes', type=int, default=10)
+    argparser.add_argument('--depth', type=int, default=3, help='length of the inheritance chains')
+    argparser.add_argument('--methods', type=int, default=4, help='methods per class')
+    argparser.add_argument('--nesting', type=int, default=3, help='depth of the expressions')
+    argparser.add_argument('--auto-density', type=float, default=0.5, help='probability of declaring AUTO_TYPE')
+    argparser.add_argument('--auto-chain', type=int, default=3, help='length of the chains of calls between methods')
+    argparser.add_argument('--lines', type=int, help='about this many lines, instead of --classes')
+    argparser.add_argument('--seed', type=int, default=0)
+    args = argparser.parse_args(argv)
+
+    parameters = { 'depth': args.depth, 'methods': args.methods, 'nesting': args.nesting,
+                   'auto_density': args.auto_density, 'auto_chain': args.auto_chain, 'seed': args.seed }
+    if args.lines:
+        print(generate_program(args.lines, **parameters), end='')
+    else:
+        print(generate(classes=args.classes, **parameters), end='')
+
+
+if __name__ == '__main__':
+    main()
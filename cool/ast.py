@@ -1,165 +1,191 @@
 # AST Classes
+# Nodes keep in `anchor` the token their position is taken from, instead of
+# copying its line and column
 class Node:
-    pass
+    __slots__ = ('anchor',)
+
+    @property
+    def line(self):
+        return self.anchor.line
+
+    @property
+    def column(self):
+        return self.anchor.column
 
 class Program(Node):
+    __slots__ = ('declarations',)
+
     def __init__(self, declarations):
         self.declarations = declarations
-        self.line = declarations[0].line
-        self.column = declarations[0].column
+        self.anchor = declarations[0].anchor
 
 class ClassDeclaration(Node):
+    __slots__ = ('id', 'parent', 'features')
+
     def __init__(self, idx, features, parent=None):
         self.id = idx
         self.parent = parent
         self.features = features
-        self.line = idx.line
-        self.column = idx.column
+        self.anchor = idx
 
 class AttrDeclaration(Node):
+    __slots__ = ('id', 'type', 'expression')
+
     def __init__(self, idx, typex, expression=None):
         self.id = idx
         self.type = typex
         self.expression = expression
-        self.line = idx.line
-        self.column = idx.column
+        self.anchor = idx
 
 class FuncDeclaration(Node):
+    __slots__ = ('id', 'params', 'type', 'body')
+
     def __init__(self, idx, params, return_type, body):
         self.id = idx
         self.params = params
         self.type = return_type
         self.body = body
-        self.line = idx.line
-        self.column = idx.column
+        self.anchor = idx
 
 class Expression(Node):
-    pass
+    __slots__ = ('static_type',)
 
 class IfThenElse(Expression):
+    __slots__ = ('condition', 'if_body', 'else_body')
+
     def __init__(self, condition, if_body, else_body):
         self.condition = condition
         self.if_body = if_body
         self.else_body = else_body
-        self.line = condition.line
-        self.column = condition.column
+        self.anchor = condition.anchor
 
 class WhileLoop(Expression):
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
-        self.line = condition.line
-        self.column = condition.column
+        self.anchor = condition.anchor
         
 class Block(Expression):
+    __slots__ = ('expressions',)
+
     def __init__(self, expressions):
         self.expressions = expressions
-        self.line = expressions[-1].line
-        self.column = expressions[-1].column
+        self.anchor = expressions[-1].anchor
 
 class LetIn(Expression):
+    __slots__ = ('let_body', 'in_body')
+
     def __init__(self, let_body, in_body):
         self.let_body = let_body
         self.in_body = in_body
-        self.line = in_body.line
-        self.column = in_body.column
+        self.anchor = in_body.anchor
 
 class CaseOf(Expression):
+    __slots__ = ('expression', 'branches')
+
     def __init__(self, expression, branches):
         self.expression = expression
         self.branches = branches
-        self.line = expression.line
-        self.column = expression.column
+        self.anchor = expression.anchor
 
 class Assign(Expression):
+    __slots__ = ('id', 'expression')
+
     def __init__(self, idx, expression):
         self.id = idx
         self.expression = expression
-        self.line = idx.line
-        self.column = idx.column
+        self.anchor = idx
 
 class Unary(Expression):
+    __slots__ = ('expression',)
+
     def __init__(self, expression):
         self.expression = expression
-        self.line = expression.line
-        self.column = expression.column
+        self.anchor = expression.anchor
 
 class Not(Unary):
-    pass
+    __slots__ = ()
 
 class Binary(Expression):
+    __slots__ = ('left', 'right')
+
     def __init__(self, left, right):
         self.left = left
         self.right = right
-        self.line = left.line
-        self.column = left.column
+        self.anchor = left.anchor
 
 class LessEqual(Binary):
-    pass
+    __slots__ = ()
 
 class Less(Binary):
-    pass
+    __slots__ = ()
 
 class Equal(Binary):
-    pass
+    __slots__ = ()
 
 class Arithmetic(Binary):
-    pass
+    __slots__ = ()
 
 class Plus(Arithmetic):
-    pass
+    __slots__ = ()
 
 class Minus(Arithmetic):
-    pass
+    __slots__ = ()
 
 class Star(Arithmetic):
-    pass
+    __slots__ = ()
 
 class Div(Arithmetic):
-    pass
+    __slots__ = ()
 
 class IsVoid(Unary):
-    pass
+    __slots__ = ()
 
 class Complement(Unary):
-    pass
+    __slots__ = ()
 
 class FunctionCall(Expression):
+    __slots__ = ('obj', 'id', 'args', 'type')
+
     def __init__(self, obj, idx, args, typex=None):
         self.obj = obj
         self.id = idx
         self.args = args
         self.type = typex
-        self.line = idx.line
-        self.column = idx.column
+        self.anchor = idx
 
 class MemberCall(Expression):
+    __slots__ = ('id', 'args')
+
     def __init__(self, idx, args):
         self.id = idx
         self.args = args
-        self.line = idx.line
-        self.column = idx.column
+        self.anchor = idx
 
 class New(Expression):
+    __slots__ = ('type',)
+
     def __init__(self, typex):
         self.type = typex
-        self.line = typex.line
-        self.column = typex.column
+        self.anchor = typex
 
 class Atomic(Expression):
+    __slots__ = ('token',)
+
     def __init__(self, token):
         self.token = token
-        self.line = token.line
-        self.column = token.column
+        self.anchor = token
 
 class Integer(Atomic):
-    pass
+    __slots__ = ()
 
 class Id(Atomic):
-    pass
+    __slots__ = ()
 
 class String(Atomic):
-    pass
+    __slots__ = ()
 
 class Bool(Atomic):
-    pass
+    __slots__ = ()
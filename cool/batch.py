@@ -0,0 +1,145 @@
+"""
+Type checks and infers every COOL program found in the given paths.
+
+Each file is reported as a JSON line on stdout with its errors and
+inferences, the aggregate throughput is reported on stderr. With --emit
+the typed AST and the context of every file are also written to the
+given directory, see cool.serialize.
+
+    $ python -m cool.batch tests/ --jobs 4 > results.jsonl
+    $ python -m cool.batch tests/ --emit build/ > results.jsonl
+"""
+import argparse
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def find_sources(paths):
+    """
+    Yields (path, relative) of every source, `relative` is the path inside
+    the directory it was found in, or the name of a file given directly
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith('.cl'):
+                        source = os.path.join(root, name)
+                        yield source, os.path.relpath(source, path)
+        else:
+            yield path, os.path.basename(path)
+
+
+def emitted_path(relative, emit, emit_format='binary'):
+    # (The tree of the sources is mirrored under `emit`, so sources with the same name do not collide)
+    name = os.path.splitext(relative)[0]
+    return os.path.join(emit, name + ('.ctast' if emit_format == 'binary' else '.ctast.json'))
+
+
+def compile_file(path, inference='worklist', emit=None, emit_format='binary', relative=None):
+    from .pipeline import run
+    from .serialize import dumps, dumps_json
+
+    start = time.perf_counter()
+    result = { 'file': path, 'errors': [], 'inferences': [], 'lines': 0, 'tokens': 0 }
+
+    try:
+        with open(path, encoding='utf8') as f:
+            code = f.read()
+        result['lines'] = code.count('\n') + 1
+
+        compilation = run(code, inference=inference)
+        result['tokens'] = len(compilation.tokens) - 1
+        result['errors'].extend(compilation.errors)
+        result['inferences'].extend(compilation.inferences)
+
+        if emit is not None and compilation.context is not None and compilation.ast is not None:
+            target = emitted_path(relative or os.path.basename(path), emit, emit_format)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if emit_format == 'binary':
+                with open(target, 'wb') as f:
+                    f.write(dumps(compilation.ast, compilation.context, compilation.errors, compilation.inferences, compress=True))
+            else:
+                with open(target, 'w', encoding='utf8') as f:
+                    f.write(dumps_json(compilation.ast, compilation.context, compilation.errors, compilation.inferences, indent=1))
+            result['emitted'] = target
+    except Exception as ex:
+        result['errors'].append(f'Internal error: {type(ex).__name__}: {ex}')
+
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def _compile_quiet(source, inference='worklist', emit=None, emit_format='binary'):
+    # the lexer and the parser report on stdout, which is reserved for the results
+    path, relative = source
+    with contextlib.redirect_stdout(sys.stderr):
+        return compile_file(path, inference, emit, emit_format, relative)
+
+
+def _init_worker():
+    # the parsing table is loaded once per worker
+    from . import parser
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(prog='python -m cool.batch', description='Type check and infer COOL programs.')
+    argparser.add_argument('paths', nargs='+', help='.cl files or directories to search for them')
+    argparser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='worker processes (default: number of CPUs)')
+    argparser.add_argument('--chunksize', type=int, default=8, help='files sent to a worker at a time')
+    argparser.add_argument('--inference', choices=('worklist', 'pass', 'constraints'), default='worklist', help='type inference mode (default: worklist)')
+    argparser.add_argument('--emit', metavar='DIR', help='write the typed AST and the context of every file to DIR')
+    argparser.add_argument('--emit-format', choices=('binary', 'json'), default='binary', help='format of the emitted files (default: binary)')
+    argparser.add_argument('--strict', action='store_true', help='exit with status 1 if any file has errors')
+    args = argparser.parse_args(argv)
+
+    sources = list(find_sources(args.paths))
+    if args.emit is not None:
+        # (Files given directly or from several directories may still map to the same output)
+        targets = {}
+        for path, relative in sources:
+            target = emitted_path(relative, args.emit, args.emit_format)
+            if target in targets:
+                argparser.error(f'{targets[target]} and {path} would both be emitted to {target}')
+            targets[target] = path
+        os.makedirs(args.emit, exist_ok=True)
+    compile_source = functools.partial(_compile_quiet, inference=args.inference, emit=args.emit, emit_format=args.emit_format)
+
+    start = time.perf_counter()
+    if args.jobs > 1 and len(sources) > 1:
+        executor = ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker)
+        results = executor.map(compile_source, sources, chunksize=args.chunksize)
+    else:
+        executor = None
+        _init_worker()
+        results = map(compile_source, sources)
+
+    files = lines = tokens = failed = 0
+    try:
+        for result in results:
+            print(json.dumps(result))
+            files += 1
+            lines += result['lines']
+            tokens += result['tokens']
+            failed += bool(result['errors'])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    sys.stdout.flush()
+
+    elapsed = time.perf_counter() - start
+    rate = lambda x: x / elapsed if elapsed else 0.0
+    print(f'{files} files ({failed} with errors), {lines} lines, {tokens} tokens in {elapsed:.3f}s: '
+          f'{rate(files):.1f} files/s, {rate(lines):.0f} lines/s, {rate(tokens):.0f} tokens/s', file=sys.stderr)
+
+    return 1 if args.strict and failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+Cache of compilation results keyed by the hash of the source text and
+of the compiler itself, so a changed compiler does not reuse old entries.
+
+Entries are plain data (errors, inferences, the contexts rendered after
+the collect and build stages and the stage measures), kept in memory
+with LRU eviction bounded by entry count and bytes, and optionally in a
+directory that survives restarts. The directory keeps the entries of the
+current compiler in a subdirectory named after CACHE_VERSION and the
+fingerprint, deletes the subdirectories of other versions and drops the
+least recently used files past its own bounds.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+
+from .pipeline import run
+
+CACHE_VERSION = 1
+
+# (Names of what the cache writes in its directory, nothing else there is removed)
+_VERSION_DIR = re.compile(r'\d+-[0-9a-f]{16}')
+_ENTRY_FILE = re.compile(r'[0-9a-f]{64}\.json')
+
+_fingerprint = None
+
+
+def compiler_fingerprint():
+    """
+    Hash of the Python sources of the compiler, computed once per process
+    """
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha256()
+        package = os.path.dirname(os.path.abspath(__file__))
+        for root, dirs, files in os.walk(package):
+            dirs[:] = sorted(x for x in dirs if not x.startswith('__'))
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    path = os.path.join(root, name)
+                    digest.update(os.path.relpath(path, package).encode('utf8') + b'\0')
+                    with open(path, 'rb') as f:
+                        digest.update(f.read())
+        _fingerprint = digest.hexdigest()
+    return _fingerprint
+
+
+def compile_entry(code, inference='worklist'):
+    """
+    Compiles `code` and returns what is shown of it as a cache entry
+    """
+    contexts = {}
+
+    def render(stage, result):
+        # (The context keeps changing in the next stages)
+        if stage in ('collect', 'build'):
+            contexts[stage] = str(result.context)
+
+    result = run(code, on_stage=render, inference=inference)
+    return {
+        'errors': result.errors,
+        'inferences': result.inferences,
+        'contexts': contexts,
+        'failed_stage': result.failed_stage,
+        'stages': [ x.as_dict() for x in result.stages ],
+    }
+
+
+class CompilationCache:
+    """
+    LRU cache of `compile_entry` results, bounded by `max_entries` and
+    `max_bytes` (of the JSON encoding of the entries). With `cache_dir`
+    the entries are also stored there and looked up on a memory miss;
+    the files are bounded by `max_disk_entries` and `max_disk_bytes`,
+    the ones read or written least recently are removed first.
+    """
+    def __init__(self, max_entries=128, max_bytes=32 * 1024 * 1024, cache_dir=None,
+                 max_disk_entries=4096, max_disk_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.pruned = False
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        # Streamlit runs every session in its own thread
+        self.lock = threading.Lock()
+        self.disk_lock = threading.Lock()
+
+    @staticmethod
+    def key(code, inference='worklist'):
+        text = f'{CACHE_VERSION}\0{compiler_fingerprint()}\0{inference}\0{code}'
+        return hashlib.sha256(text.encode('utf8')).hexdigest()
+
+    def compile(self, code, inference='worklist'):
+        """
+        Returns the entry of `code` and whether it was cached
+        """
+        key = self.key(code, inference)
+        with self.lock:
+            entry = self._get(key)
+        if entry is not None:
+            return entry, True
+
+        entry = compile_entry(code, inference)
+        data = json.dumps(entry).encode('utf8')
+        with self.lock:
+            self.misses += 1
+            self._put(key, entry, len(data))
+        self._save(key, data)
+        return entry, False
+
+    def _get(self, key):
+        try:
+            entry, _ = self.entries[key]
+        except KeyError:
+            pass
+        else:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        data = self._load(key)
+        if data is None:
+            return None
+        try:
+            entry = json.loads(data)
+        except ValueError:
+            return None
+        self.disk_hits += 1
+        self._put(key, entry, len(data))
+        return entry
+
+    def _put(self, key, entry, size):
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self.entries[key] = (entry, size)
+        self.size += size
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.size -= evicted
+            self.evictions += 1
+
+    @staticmethod
+    def version_dir():
+        return f'{CACHE_VERSION}-{compiler_fingerprint()[:16]}'
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, self.version_dir(), f'{key}.json')
+
+    def _load(self, key):
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # (The modification time orders the files for the eviction)
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def _save(self, key, data):
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            # A read-only location only costs a compilation after a restart
+            return
+        with self.disk_lock:
+            try:
+                if not self.pruned:
+                    self.pruned = True
+                    self._prune_versions()
+                self._evict_files()
+            except OSError:
+                pass
+
+    def _prune_versions(self):
+        # (Entries of another compiler or format can not be looked up again)
+        current = self.version_dir()
+        for entry in os.scandir(self.cache_dir):
+            if entry.name == current:
+                continue
+            if entry.is_dir(follow_symlinks=False) and _VERSION_DIR.fullmatch(entry.name):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            elif entry.is_file(follow_symlinks=False) and _ENTRY_FILE.fullmatch(entry.name):
+                # (Files of before the subdirectories)
+                self._remove(entry.path)
+
+    def _evict_files(self):
+        files = []
+        size = 0
+        for entry in os.scandir(os.path.join(self.cache_dir, self.version_dir())):
+            if _ENTRY_FILE.fullmatch(entry.name):
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    # (Removed meanwhile by another process)
+                    continue
+                files.append((stat.st_mtime, entry.path, stat.st_size))
+                size += stat.st_size
+        files.sort()
+        count = len(files)
+        for _, path, file_size in files:
+            if count <= self.max_disk_entries and size <= self.max_disk_bytes:
+                break
+            if self._remove(path):
+                self.disk_evictions += 1
+            count -= 1
+            size -= file_size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        return True
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_evictions': self.disk_evictions,
+            }
+
+    def __len__(self):
+        return len(self.entries)
@@ -1,3 +1,5 @@
+from array import array
+
 try:
     import pydot
 except:
@@ -13,18 +15,8 @@ class State:
         self.formatter = formatter
 
     def set_formatter(self, formatter, visited=None):
-        if visited is None:
-            visited = set()
-        elif self in visited:
-            return
-
-        visited.add(self)
-        self.formatter = formatter
-        for destinations in self.transitions.values():
-            for node in destinations:
-                node.set_formatter(formatter, visited)
-        for node in self.epsilon_transitions:
-            node.set_formatter(formatter, visited)
+        for node in self._visit(visited):
+            node.formatter = formatter
         return self
 
     def has_transition(self, symbol):
@@ -49,34 +41,85 @@ class State:
         return any(s.final for s in states)
 
     def to_deterministic(self, formatter=lambda x: str(x)):
-        closure = self.epsilon_closure
-        start = State(tuple(closure), any(s.final for s in closure), formatter)
-
-        closures = [ closure ]
-        states = [ start ]
-        pending = [ start ]
+        """
+        Subset construction. The NFA states are numbered and every subset is
+        an int with the bits of its states; the epsilon closure of every
+        state and of every move from it are computed once
+        """
+        states = list(self)
+        index = { id(s): i for i, s in enumerate(states) }
+
+        # (Epsilon closure of every state as a bitset, from its own epsilon transitions)
+        closures = []
+        for state in states:
+            closure = 1 << index[id(state)]
+            pending = [ state ]
+            while pending:
+                for target in pending.pop().epsilon_transitions:
+                    bit = 1 << index[id(target)]
+                    if not closure & bit:
+                        closure |= bit
+                        pending.append(target)
+            closures.append(closure)
+
+        # (Closure of the targets of every transition)
+        moves = []
+        for state in states:
+            move = {}
+            for symbol, destinations in state.transitions.items():
+                bits = 0
+                for target in destinations:
+                    bits |= closures[index[id(target)]]
+                move[symbol] = bits
+            moves.append(move)
+
+        finals = 0
+        for i, state in enumerate(states):
+            if state.final:
+                finals |= 1 << i
+
+        def members(bits):
+            while bits:
+                low = bits & -bits
+                yield low.bit_length() - 1
+                bits ^= low
+
+        def create(bits):
+            return State(tuple(states[i] for i in members(bits)), bool(bits & finals), formatter)
+
+        closure = closures[0]
+        start = create(closure)
+        subsets = { closure: start }
+        pending = [ closure ]
 
         while pending:
-            state = pending.pop()
-            symbols = { symbol for s in state.state for symbol in s.transitions }
-
-            for symbol in symbols:
-                move = self.move_by_state(symbol, *state.state)
-                closure = self.epsilon_closure_by_state(*move)
-
-                if closure not in closures:
-                    new_state = State(tuple(closure), any(s.final for s in closure), formatter)
-                    closures.append(closure)
-                    states.append(new_state)
-                    pending.append(new_state)
-                else:
-                    index = closures.index(closure)
-                    new_state = states[index]
-
-                state.add_transition(symbol, new_state)
+            bits = pending.pop()
+            state = subsets[bits]
+
+            targets = {}
+            for i in members(bits):
+                for symbol, move in moves[i].items():
+                    targets[symbol] = targets.get(symbol, 0) | move
+
+            for symbol, target in targets.items():
+                try:
+                    new_state = subsets[target]
+                except KeyError:
+                    new_state = subsets[target] = create(target)
+                    pending.append(target)
+                # (Every symbol is added once to a new state)
+                state.transitions[symbol] = [ new_state ]
 
         return start
 
+    def to_table(self, label=None):
+        """
+        DFATable of this deterministic automaton, the states are numbered
+        breadth first from this one. `label(state)` tells the final states
+        apart, by default it is `state.final`
+        """
+        return DFATable.from_state(self, label)
+
     @staticmethod
     def from_nfa(nfa, get_states=False):
         states = []
@@ -149,6 +192,7 @@ class State:
         yield from self._visit()
 
     def _visit(self, visited=None):
+        # (Preorder of the recursive traversal, with an explicit stack of the pending children)
         if visited is None:
             visited = set()
         elif self in visited:
@@ -157,11 +201,21 @@ class State:
         visited.add(self)
         yield self
 
+        stack = [ self._children() ]
+        while stack:
+            for node in stack[-1]:
+                if node not in visited:
+                    visited.add(node)
+                    yield node
+                    stack.append(node._children())
+                    break
+            else:
+                stack.pop()
+
+    def _children(self):
         for destinations in self.transitions.values():
-            for node in destinations:
-                yield from node._visit(visited)
-        for node in self.epsilon_transitions:
-            yield from node._visit(visited)
+            yield from destinations
+        yield from self.epsilon_transitions
 
     def graph(self):
         G = pydot.Dot(rankdir='LR', margin=0.1)
@@ -195,6 +249,147 @@ class State:
     def write_to(self, fname):
         return self.graph().write_svg(fname)
 
+class DFATable:
+    """
+    A deterministic automaton as dense tables, the start state is 0.
+
+    symbols     : symbols of the transitions, a symbol is the column of its index
+    transitions : array of the target of every state and column, the one
+                  of `state` on `column` is `transitions[state * len(symbols) + column]`,
+                  -1 if there is none
+    labels      : label of every state, None if it is not final
+    """
+    def __init__(self, symbols, transitions, labels):
+        self.symbols = list(symbols)
+        self.columns = { x: i for i, x in enumerate(self.symbols) }
+        self.transitions = array('i', transitions)
+        self.labels = list(labels)
+
+    @property
+    def states(self):
+        return len(self.labels)
+
+    @staticmethod
+    def from_state(start, label=None):
+        label = label or (lambda state: True if state.final else None)
+        numbers = { id(start): 0 }
+        states = [ start ]
+        for state in states:
+            for destinations in state.transitions.values():
+                if len(destinations) != 1:
+                    raise ValueError('The automaton is not deterministic')
+                target = destinations[0]
+                if id(target) not in numbers:
+                    numbers[id(target)] = len(states)
+                    states.append(target)
+            if state.epsilon_transitions:
+                raise ValueError('The automaton is not deterministic')
+
+        symbols = list(dict.fromkeys(symbol for state in states for symbol in state.transitions))
+        columns = { x: i for i, x in enumerate(symbols) }
+        transitions = [ -1 ] * (len(states) * len(symbols))
+        for i, state in enumerate(states):
+            for symbol, (target,) in state.transitions.items():
+                transitions[i * len(symbols) + columns[symbol]] = numbers[id(target)]
+        return DFATable(symbols, transitions, [ label(x) for x in states ])
+
+    def next(self, state, symbol):
+        column = self.columns.get(symbol)
+        return -1 if column is None else self.transitions[state * len(self.symbols) + column]
+
+    def recognize(self, string):
+        state = 0
+        for symbol in string:
+            state = self.next(state, symbol)
+            if state < 0:
+                return False
+        return self.labels[state] is not None
+
+    def minimize(self):
+        """
+        Hopcroft's algorithm, the states start split by their label. The
+        states that can not reach a final one are merged with the missing
+        transitions and dropped
+        """
+        width = len(self.symbols)
+        count = self.states
+        dead = count
+        transitions = self.transitions
+
+        # (Sources of every state by column, the dead state is the target of the missing transitions)
+        inverse = [ [ [] for _ in range(count + 1) ] for _ in range(width) ]
+        for state in range(count):
+            for column in range(width):
+                target = transitions[state * width + column]
+                inverse[column][dead if target < 0 else target].append(state)
+        for column in range(width):
+            inverse[column][dead].append(dead)
+
+        groups = {}
+        for state, label in enumerate(self.labels + [ None ]):
+            groups.setdefault(label, set()).add(state)
+        blocks = list(groups.values())
+        block_of = [ 0 ] * (count + 1)
+        for i, block in enumerate(blocks):
+            for state in block:
+                block_of[state] = i
+
+        waiting = set(range(len(blocks)))
+        while waiting:
+            # (A copy, the splitter may be split by itself)
+            splitter = list(blocks[waiting.pop()])
+            for column in range(width):
+                sources = inverse[column]
+                touched = {}
+                for target in splitter:
+                    for state in sources[target]:
+                        touched.setdefault(block_of[state], set()).add(state)
+
+                for i, inside in touched.items():
+                    block = blocks[i]
+                    if len(inside) == len(block):
+                        continue
+                    block -= inside
+                    j = len(blocks)
+                    blocks.append(inside)
+                    for state in inside:
+                        block_of[state] = j
+                    if i in waiting:
+                        waiting.add(j)
+                    else:
+                        waiting.add(j if len(inside) <= len(block) else i)
+
+        # (Number the blocks breadth first from the start, without the dead one)
+        dead_block = block_of[dead]
+        numbers = { block_of[0]: 0 }
+        order = [ block_of[0] ]
+        for block in order:
+            state = next(iter(blocks[block]))
+            for column in range(width):
+                target = transitions[state * width + column]
+                target = dead_block if target < 0 else block_of[target]
+                if target != dead_block and target not in numbers:
+                    numbers[target] = len(order)
+                    order.append(target)
+
+        minimized = [ -1 ] * (len(order) * width)
+        labels = []
+        for number, block in enumerate(order):
+            state = next(iter(blocks[block]))
+            labels.append(self.labels[state])
+            for column in range(width):
+                target = transitions[state * width + column]
+                if target >= 0 and block_of[target] != dead_block:
+                    minimized[number * width + column] = numbers[block_of[target]]
+        return DFATable(self.symbols, minimized, labels)
+
+    def export(self):
+        """
+        The tables as plain values, to be stored and loaded again with
+        `DFATable(**table)`
+        """
+        return { 'symbols': self.symbols, 'transitions': self.transitions.tolist(), 'labels': self.labels }
+
 def multiline_formatter(state):
     return '\n'.join(str(item) for item in state)
 
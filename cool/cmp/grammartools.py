@@ -1,3 +1,7 @@
+import hashlib
+import os
+import pickle
+from array import array
 from queue import Queue
 from .pycompiler import Grammar, Item
 from .automata import State
@@ -36,47 +40,98 @@ class GrammarTools:
 
         return first_alpha
 
+    @staticmethod
+    def compute_nullables(G: Grammar):
+        """
+        Nonterminals that derive epsilon, every production is looked at once
+        after the last nonterminal of its right side is known to be nullable
+        """
+        nullables = set()
+        pending = []
+        remaining = []
+        occurrences = { X: [] for X in G.nonTerminals }
+
+        for i, production in enumerate(G.Productions):
+            alpha = list(production.Right)
+            if any(symbol.IsTerminal for symbol in alpha):
+                remaining.append(None)
+                continue
+            remaining.append(len(alpha))
+            for symbol in alpha:
+                occurrences[symbol].append(i)
+            if not alpha and production.Left not in nullables:
+                nullables.add(production.Left)
+                pending.append(production.Left)
+
+        while pending:
+            for i in occurrences[pending.pop()]:
+                remaining[i] -= 1
+                X = G.Productions[i].Left
+                if remaining[i] == 0 and X not in nullables:
+                    nullables.add(X)
+                    pending.append(X)
+
+        return nullables
+
     @staticmethod
     def compute_firsts(G: Grammar):
         """
         Computes First(Vt) U First(Vn) U First(alpha)
         P: X -> alpha
+
+        First(X) includes First(Y) when X -> beta Y gamma and beta ->* epsilon,
+        the nonterminals in a cycle of that relation have the same First.
+        Each strongly connected component is computed once, after the ones
+        it includes, with the terminals as bits of an int
         """
+        sets = TerminalSets(G)
+        bits, epsilon = sets.bits, sets.epsilon
+        nullables = GrammarTools.compute_nullables(G)
+
+        # (Terminals that start the right sides of X and the nonterminals whose First is in First(X))
+        direct = { X: 0 for X in G.nonTerminals }
+        includes = { X: [] for X in G.nonTerminals }
+        for production in G.Productions:
+            X = production.Left
+            for symbol in production.Right:
+                if symbol.IsTerminal:
+                    direct[X] |= bits[symbol]
+                    break
+                includes[X].append(symbol)
+                if symbol not in nullables:
+                    break
+
+        first = {}
+        for component in strong_components(G.nonTerminals, includes):
+            value = 0
+            for X in component:
+                value |= direct[X]
+                for Y in includes[X]:
+                    value |= first.get(Y, 0) & ~epsilon
+            for X in component:
+                first[X] = value | (epsilon if X in nullables else 0)
+
         firsts = {}
-        change = True
-        
-        # init First(Vt)
         for terminal in G.terminals:
             firsts[terminal] = ContainerSet(terminal)
-            
-        # init First(Vn)
         for nonterminal in G.nonTerminals:
-            firsts[nonterminal] = ContainerSet()
-        
-        while change:
-            change = False
-            
-            # P: X -> alpha
-            for production in G.Productions:
-                X = production.Left
-                alpha = production.Right
-                
-                # get current First(X)
-                first_X = firsts[X]
-                    
-                # init First(alpha)
-                try:
-                    first_alpha = firsts[alpha]
-                except:
-                    first_alpha = firsts[alpha] = ContainerSet()
-                
-                # CurrentFirst(alpha)???
-                local_first = GrammarTools.compute_local_first(firsts, alpha)
-                
-                # update First(X) and First(alpha) from CurrentFirst(alpha)
-                change |= first_alpha.hard_update(local_first)
-                change |= first_X.hard_update(local_first)
-                        
+            firsts[nonterminal] = sets.container(first[nonterminal])
+
+        for production in G.Productions:
+            alpha = production.Right
+            if alpha in firsts:
+                continue
+            value = epsilon
+            for symbol in alpha:
+                if symbol.IsTerminal:
+                    value = (value & ~epsilon) | bits[symbol]
+                    break
+                value = (value & ~epsilon) | first[symbol]
+                if symbol not in nullables:
+                    value &= ~epsilon
+                    break
+            firsts[alpha] = sets.container(value)
+
         # First(Vt) + First(Vt) + First(RightSides)
         return firsts
 
@@ -84,43 +139,48 @@ class GrammarTools:
     def compute_follows(G: Grammar, firsts):
         """
         Computes Follow(Vn)
+
+        Follow(Y) includes Follow(X) when X -> zeta Y beta and beta ->* epsilon,
+        so it is computed by strongly connected components like First
         """
-        follows = { }
-        change = True
-        
-        local_firsts = {}
-        
-        # init Follow(Vn)
-        for nonterminal in G.nonTerminals:
-            follows[nonterminal] = ContainerSet()
-        follows[G.startSymbol] = ContainerSet(G.EOF)
-        
-        while change:
-            change = False
-            
-            # P: X -> alpha
-            for production in G.Productions:
-                X = production.Left
-                alpha = production.Right
-                
-                follow_X = follows[X]
-                
-                # X -> zeta Y beta
-                # First(beta) - { epsilon } subset of Follow(Y)
-                # beta ->* epsilon or X -> zeta Y ? Follow(X) subset of Follow(Y)
-                for i, symbol in enumerate(alpha):
-                    if symbol.IsNonTerminal:
-                        follow_symbol = follows[symbol]
-                        beta = alpha[i + 1:]
-                        try:
-                            first_beta = local_firsts[beta]
-                        except KeyError:
-                            first_beta = local_firsts[beta] = GrammarTools.compute_local_first(firsts, beta)
-                        change |= follow_symbol.update(first_beta)
-                        if first_beta.contains_epsilon or len(beta) == 0:
-                            change |= follow_symbol.update(follow_X)
-        
-        return follows
+        sets = TerminalSets(G)
+        bits, epsilon = sets.bits, sets.epsilon
+        first = { X: sets.bits_of(firsts[X]) for X in G.nonTerminals }
+
+        # (Terminals that follow Y in a right side and the nonterminals whose Follow is in Follow(Y))
+        direct = { X: 0 for X in G.nonTerminals }
+        direct[G.startSymbol] = bits[G.EOF]
+        includes = { X: [] for X in G.nonTerminals }
+        for production in G.Productions:
+            X = production.Left
+            # X -> zeta Y beta, from the end: `trailer` is First(beta) - { epsilon }
+            trailer = 0
+            nullable = True
+            for symbol in reversed(list(production.Right)):
+                if symbol.IsTerminal:
+                    trailer = bits[symbol]
+                    nullable = False
+                    continue
+                direct[symbol] |= trailer
+                if nullable and symbol is not X:
+                    includes[symbol].append(X)
+                if first[symbol] & epsilon:
+                    trailer |= first[symbol] & ~epsilon
+                else:
+                    trailer = first[symbol]
+                    nullable = False
+
+        follow = {}
+        for component in strong_components(G.nonTerminals, includes):
+            value = 0
+            for Y in component:
+                value |= direct[Y]
+                for X in includes[Y]:
+                    value |= follow.get(X, 0)
+            for Y in component:
+                follow[Y] = value
+
+        return { X: sets.container(follow[X]) for X in G.nonTerminals }
 
     @staticmethod
     def _register(table, state, symbol, value):
@@ -139,6 +199,81 @@ class GrammarTools:
 
         return len(cell) == 1
 
+class TerminalSets:
+    """
+    Sets of terminals of a grammar as ints: the i-th terminal is the bit i,
+    EOF the next one and epsilon the last
+    """
+    def __init__(self, G: Grammar):
+        self.terminals = list(G.terminals)
+        if G.EOF not in self.terminals:
+            self.terminals.append(G.EOF)
+        self.bits = { x: 1 << i for i, x in enumerate(self.terminals) }
+        self.epsilon = 1 << len(self.terminals)
+
+    def bits_of(self, container):
+        value = self.epsilon if container.contains_epsilon else 0
+        for terminal in container:
+            value |= self.bits[terminal]
+        return value
+
+    def container(self, value):
+        terminals = []
+        rest = value & ~self.epsilon
+        while rest:
+            low = rest & -rest
+            terminals.append(self.terminals[low.bit_length() - 1])
+            rest ^= low
+        return ContainerSet(*terminals, contains_epsilon=bool(value & self.epsilon))
+
+
+def strong_components(nodes, edges):
+    """
+    Strongly connected components of the graph, every component comes
+    after the ones it has edges to. Tarjan's algorithm with an explicit
+    stack
+    """
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    components = []
+
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        pending = [ (root, iter(edges[root])) ]
+        while pending:
+            node, children = pending[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    pending.append((child, iter(edges[child])))
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index[child])
+            else:
+                pending.pop()
+                if pending:
+                    parent = pending[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member is node:
+                            break
+                    components.append(component)
+
+    return components
+
 class Action(tuple):
     SHIFT = 'SHIFT'
     REDUCE = 'REDUCE'
@@ -154,51 +289,330 @@ class Action(tuple):
     __repr__ = __str__
 
 class ShiftReduceParser:  
-    def __init__(self, G, verbose=False):
+    # Bump whenever the layout of the cached tables changes
+    TABLE_VERSION = 1
+
+    def __init__(self, G, verbose=False, cache_dir=None, compress_table=False):
         self.G = G
         self.verbose = verbose
         self.action = {}
         self.goto = {}
-        self._build_parsing_table()
+        if cache_dir is None or not self.load_parsing_table(cache_dir):
+            self._build_parsing_table()
+            if cache_dir is not None:
+                self.save_parsing_table(cache_dir)
+        self.table = ParsingTable(self, compress_table)
     
     def _build_parsing_table(self):
         raise NotImplementedError()
 
+    @property
+    def table_key(self):
+        """
+        Identifies the tables built by this parser for the current grammar:
+        a hash of the parser kind, the table format and the productions of `G`
+        """
+        data = f'{type(self).__name__}:{self.TABLE_VERSION}:{self.G.to_json}'
+        return hashlib.sha256(data.encode('utf8')).hexdigest()
+
+    def table_path(self, cache_dir):
+        return os.path.join(cache_dir, f'{type(self).__name__}.table')
+
+    def save_parsing_table(self, cache_dir):
+        """
+        Stores `action` and `goto` in `cache_dir`.
+        Symbols and productions are saved as indexes into `G`
+        """
+        terminals = { t: i for i, t in enumerate(self.G.terminals + [self.G.EOF]) }
+        nonterminals = { n: i for i, n in enumerate(self.G.nonTerminals) }
+        productions = { p: i for i, p in enumerate(self.G.Productions) }
+
+        def encode(action):
+            kind, tag = action
+            if kind == Action.SHIFT:
+                return 3 * tag
+            if kind == Action.REDUCE:
+                return 3 * productions[tag] + 1
+            return 2
+
+        data = {
+            'version': self.TABLE_VERSION,
+            'key': self.table_key,
+            'is_lr1': getattr(self, 'is_lr1', True),
+            'action': { state: [ (terminals[t], [encode(x) for x in cell]) for t, cell in row.items() ]
+                        for state, row in self.action.items() },
+            'goto': { state: [ (nonterminals[n], cell) for n, cell in row.items() ]
+                      for state, row in self.goto.items() },
+        }
+
+        path = self.table_path(cache_dir)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f'{path}.{os.getpid()}.tmp'
+            with open(tmp, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError:
+            # A read-only location only costs a rebuild on the next import
+            return False
+        return True
+
+    def load_parsing_table(self, cache_dir):
+        """
+        Loads `action` and `goto` from `cache_dir`.
+        Returns False if there is no table for the current grammar
+        """
+        try:
+            with open(self.table_path(cache_dir), 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+            return False
+
+        if not isinstance(data, dict) or data.get('version') != self.TABLE_VERSION or data.get('key') != self.table_key:
+            return False
+
+        terminals = self.G.terminals + [self.G.EOF]
+        nonterminals = self.G.nonTerminals
+        productions = self.G.Productions
+
+        def decode(code):
+            tag, kind = divmod(code, 3)
+            if kind == 0:
+                return Action((Action.SHIFT, tag))
+            if kind == 1:
+                return Action((Action.REDUCE, productions[tag]))
+            return Action((Action.OK, ''))
+
+        self.action = { state: { terminals[t]: [decode(x) for x in cell] for t, cell in row }
+                        for state, row in data['action'].items() }
+        self.goto = { state: { nonterminals[n]: cell for n, cell in row }
+                      for state, row in data['goto'].items() }
+        self.is_lr1 = data['is_lr1']
+        self.augmentedG = self.G.AugmentedGrammar(True)
+        self.automaton = None
+        return True
+
     def __call__(self, w):
+        table = self.table
+        terminal_ids = table.terminal_ids
+        base, check, value = table.base, table.check, table.value
+        goto, goto_width = table.goto, table.goto_width
+        lengths, lefts, productions = table.lengths, table.lefts, table.productions
+        accept = table.accept
+        SHIFT, REDUCE = Action.SHIFT, Action.REDUCE
+
         stack = [ 0 ]
         cursor = 0
         output, operations = [], []
+        lookahead = terminal_ids.get(w[cursor].token_type)
         
         while True:
             state = stack[-1]
-            lookahead = w[cursor].token_type
             if self.verbose: print(stack, w[cursor:])
-                
+
             # (Detect error)
-            try:
-                action, tag = self.action[state][lookahead][0]
-                # (Shift case)
-                if action == Action.SHIFT:
-                    stack.append(tag)
-                    cursor += 1
-                    operations.append(action)
-                # (Reduce case)
-                elif action == Action.REDUCE:
-                    for _ in range(len(tag.Right)): stack.pop()
-                    stack.append(self.goto[stack[-1]][tag.Left][0])
-                    output.append(tag)
-                    operations.append(action)
-                # (OK case)
-                elif action == Action.OK:
-                    # output.reverse()
-                    return output, operations
-                # (Invalid case)
-                else:
-                    assert False, 'Must be something wrong!'
-            except KeyError:
+            code = 0
+            if lookahead is not None:
+                offset = base[state]
+                if check[offset + lookahead] == offset:
+                    code = value[offset + lookahead]
+
+            # (Shift case)
+            if code > 0:
+                stack.append(code - 1)
+                cursor += 1
+                lookahead = terminal_ids.get(w[cursor].token_type)
+                operations.append(SHIFT)
+            # (OK case)
+            elif code == accept:
+                return output, operations
+            # (Reduce case)
+            elif code < 0:
+                production = -code - 1
+                length = lengths[production]
+                if length:
+                    del stack[-length:]
+                stack.append(goto[stack[-1] * goto_width + lefts[production]])
+                output.append(productions[production])
+                operations.append(REDUCE)
+            # (Invalid case)
+            else:
                 print('Parsing Error:', stack, w[cursor:])
                 return w[cursor:][0], None
 
+    def evaluate(self, w):
+        """
+        Parses `w` running the synthesized rule of each production as it is
+        reduced, the value of every symbol is kept in a stack next to its
+        state. Returns the value of the start symbol, raises ParsingError
+        with the offending token
+        """
+        table = self.table
+        terminal_ids = table.terminal_ids
+        base, check, value = table.base, table.check, table.value
+        goto, goto_width = table.goto, table.goto_width
+        lengths, lefts, rules = table.lengths, table.lefts, table.rules
+        accept = table.accept
+
+        stack = [ 0 ]
+        values = [ None ]
+        cursor = 0
+        lookahead = terminal_ids.get(w[cursor].token_type)
+
+        while True:
+            state = stack[-1]
+            if self.verbose: print(stack, w[cursor:])
+
+            # (Detect error)
+            code = 0
+            if lookahead is not None:
+                offset = base[state]
+                if check[offset + lookahead] == offset:
+                    code = value[offset + lookahead]
+
+            # (Shift case)
+            if code > 0:
+                stack.append(code - 1)
+                values.append(w[cursor])
+                cursor += 1
+                lookahead = terminal_ids.get(w[cursor].token_type)
+            # (OK case)
+            elif code == accept:
+                return values[-1]
+            # (Reduce case)
+            elif code < 0:
+                production = -code - 1
+                length = lengths[production]
+                if length:
+                    # (Same arguments as evaluate_reverse_parse, index 0 is the head)
+                    synthesized = values[-length - 1:]
+                    synthesized[0] = None
+                    result = rules[production](None, synthesized)
+                    del stack[-length:]
+                    del values[-length:]
+                else:
+                    result = rules[production](None, None)
+                stack.append(goto[stack[-1] * goto_width + lefts[production]])
+                values.append(result)
+            # (Invalid case)
+            else:
+                raise ParsingError(w[cursor])
+
+class ParsingError(Exception):
+    def __init__(self, token):
+        super().__init__('Parsing error near "%s".' % token.lex)
+        self.token = token
+
+    @property
+    def text(self):
+        return self.args[0]
+
+class ParsingTable:
+    """
+    `action` and `goto` of a ShiftReduceParser compiled to flat integer arrays.
+
+    Terminals, nonterminals and productions get dense ids, and each action
+    is a single int: `s + 1` shifts to state `s`, `-(p + 1)` reduces by
+    production `p`, `accept` is OK and 0 is an error.
+    Action rows are stored by row displacement: the cell of (state, terminal)
+    is `value[base[state] + terminal]` if `check` at that index equals
+    `base[state]`. With `compress=False` every row gets its own slice of
+    `value`, otherwise equal rows share one slice and rows are packed so
+    they interleave in the holes of each other.
+    """
+    def __init__(self, parser, compress=False):
+        G = parser.G
+        terminals = G.terminals + [G.EOF]
+        self.terminal_ids = { t: i for i, t in enumerate(terminals) }
+        self.nonterminal_ids = { n: i for i, n in enumerate(G.nonTerminals) }
+        self.productions = list(G.Productions)
+        production_ids = { p: i for i, p in enumerate(self.productions) }
+        self.lengths = array('i', (len(p.Right) for p in self.productions))
+        self.lefts = array('i', (self.nonterminal_ids[p.Left] for p in self.productions))
+        self.accept = -(len(self.productions) + 1)
+        # (Synthesized rule of each production, None for plain productions)
+        self.rules = [ getattr(p, 'attributes', (None,))[0] for p in self.productions ]
+        self.compressed = compress
+
+        states = 1 + max(list(parser.action) + list(parser.goto) + [0])
+
+        rows = [ [] for _ in range(states) ]
+        for state, row in parser.action.items():
+            for terminal, cell in row.items():
+                kind, tag = cell[0]
+                if kind == Action.SHIFT:
+                    code = tag + 1
+                elif kind == Action.REDUCE:
+                    code = -(production_ids[tag] + 1)
+                else:
+                    code = self.accept
+                rows[state].append((self.terminal_ids[terminal], code))
+
+        width = len(terminals)
+        self.base = array('i', [0] * states)
+        if compress:
+            size = self._pack(rows, width)
+        else:
+            for state in range(states):
+                self.base[state] = state * width
+            size = states * width
+
+        self.check = array('i', [-1] * size)
+        self.value = array('i', [0] * size)
+        for state, row in enumerate(rows):
+            offset = self.base[state]
+            for terminal, code in row:
+                self.check[offset + terminal] = offset
+                self.value[offset + terminal] = code
+
+        self.goto_width = len(G.nonTerminals)
+        self.goto = array('i', [-1] * (states * self.goto_width))
+        for state, row in parser.goto.items():
+            for nonterminal, cell in row.items():
+                self.goto[state * self.goto_width + self.nonterminal_ids[nonterminal]] = cell[0]
+
+    def _pack(self, rows, width):
+        # (First fit, densest rows first, equal rows share their offset)
+        used = bytearray(sum(len(row) for row in rows) + width)
+        offsets = {}
+        taken = set()
+
+        for state in sorted(range(len(rows)), key=lambda x: -len(rows[x])):
+            row = tuple(sorted(rows[state]))
+            try:
+                self.base[state] = offsets[row]
+                continue
+            except KeyError:
+                pass
+
+            columns = [ terminal for terminal, _ in row ]
+            lowest = columns[0] if columns else 0
+
+            # (Only offsets that put the first column on a free slot are tried,
+            #  offsets must be unique since `check` holds the offset of the row)
+            free = lowest
+            while True:
+                free = used.find(0, free)
+                offset = free - lowest
+                if offset + width > len(used):
+                    used.extend(bytes(offset + width - len(used)))
+                if offset not in taken and not any(used[offset + c] for c in columns):
+                    break
+                free += 1
+
+            self.base[state] = offsets[row] = offset
+            taken.add(offset)
+            for c in columns:
+                used[offset + c] = 1
+
+        # every row is addressable up to its last column
+        return max((self.base[state] + width for state in range(len(rows))), default=0)
+
+    @property
+    def nbytes(self):
+        arrays = (self.base, self.check, self.value, self.goto, self.lengths, self.lefts)
+        return sum(x.itemsize * len(x) for x in arrays)
+
 class LR1Parser(ShiftReduceParser):
     @staticmethod
     def expand(item, firsts):
@@ -230,20 +644,59 @@ class LR1Parser(ShiftReduceParser):
         return { Item(x.production, x.pos, set(lookahead)) for x, lookahead in centers.items() }
 
     @staticmethod
-    def closure_lr1(items, firsts):
-        closure = ContainerSet(*items)
-        
-        changed = True
-        while changed:
-            changed = False
-            
-            new_items = ContainerSet()
-            for item in closure:
-                new_items.extend(LR1Parser.expand(item, firsts))
+    def suffix_first(production, pos, firsts, suffix_firsts):
+        """
+        First(alpha) for the suffix alpha of `production` starting at `pos`,
+        memoized in `suffix_firsts`
+        """
+        key = (production, pos)
+        try:
+            return suffix_firsts[key]
+        except KeyError:
+            first = suffix_firsts[key] = GrammarTools.compute_local_first(firsts, production.Right[pos:])
+            return first
 
-            changed = closure.update(new_items)
-            
-        return LR1Parser.compress(closure)
+    @staticmethod
+    def closure_lr1(items, firsts, suffix_firsts=None):
+        if suffix_firsts is None:
+            suffix_firsts = {}
+
+        # (production, pos) -> lookaheads, items with the same center are kept compressed
+        closure = {}
+        pending = []
+        for item in items:
+            center = (item.production, item.pos)
+            lookaheads = closure.setdefault(center, set())
+            new = item.lookaheads - lookaheads
+            lookaheads.update(new)
+            pending.append((item.production, item.pos, new))
+
+        # (Only lookaheads that were just added are propagated)
+        while pending:
+            production, pos, new = pending.pop()
+            if pos == len(production.Right):
+                continue
+            next_symbol = production.Right[pos]
+            if not next_symbol.IsNonTerminal:
+                continue
+
+            first = LR1Parser.suffix_first(production, pos + 1, firsts, suffix_firsts)
+            lookaheads = first.set | new if first.contains_epsilon else first.set
+
+            for child in next_symbol.productions:
+                center = (child, 0)
+                try:
+                    current = closure[center]
+                except KeyError:
+                    closure[center] = added = set(lookaheads)
+                else:
+                    added = lookaheads - current
+                    if not added:
+                        continue
+                    current.update(added)
+                pending.append((child, 0, added))
+
+        return { Item(production, pos, lookaheads) for (production, pos), lookaheads in closure.items() }
     
     @staticmethod
     def goto_lr1(items, symbol, firsts=None, just_kernel=False):
@@ -251,18 +704,36 @@ class LR1Parser(ShiftReduceParser):
         items = frozenset(item.NextItem() for item in items if item.NextSymbol == symbol)
         return items if just_kernel else LR1Parser.closure_lr1(items, firsts)
 
+    @staticmethod
+    def goto_kernels(items, symbols):
+        """
+        Kernels of every goto from `items` in a single pass, as (symbol, kernel) pairs
+        ordered by the position of the symbol in `symbols`
+        """
+        kernels = {}
+        for item in items:
+            next_symbol = item.NextSymbol
+            if next_symbol is not None:
+                try:
+                    kernels[next_symbol].append(item.NextItem())
+                except KeyError:
+                    kernels[next_symbol] = [ item.NextItem() ]
+
+        return [ (symbol, frozenset(kernels[symbol])) for symbol in sorted(kernels, key=symbols.__getitem__) ]
 
     def build_LR1_automaton(self):
         G = self.augmentedG = self.G.AugmentedGrammar(True)
 
         firsts = GrammarTools.compute_firsts(G)
         firsts[G.EOF] = ContainerSet(G.EOF)
+        suffix_firsts = {}
+        symbols = { symbol: i for i, symbol in enumerate(G.terminals + G.nonTerminals) }
         
         start_production = G.startSymbol.productions[0]
         start_item = Item(start_production, 0, lookaheads=(G.EOF,))
         start = frozenset([start_item])
         
-        closure = LR1Parser.closure_lr1(start, firsts)
+        closure = LR1Parser.closure_lr1(start, firsts, suffix_firsts)
         automaton = State(frozenset(closure), True)
         
         pending = [ start ]
@@ -272,27 +743,25 @@ class LR1Parser(ShiftReduceParser):
             current = pending.pop()
             current_state = visited[current]
             
-            for symbol in G.terminals + G.nonTerminals:
+            for symbol, kernels in LR1Parser.goto_kernels(current_state.state, symbols):
                 # (Get/Build `next_state`)
-                kernels = LR1Parser.goto_lr1(current_state.state, symbol, just_kernel=True)
-                
-                if not kernels:
-                    continue
-                
                 try:
                     next_state = visited[kernels]
                 except KeyError:
                     pending.append(kernels)
-                    visited[pending[-1]] = next_state = State(frozenset(LR1Parser.goto_lr1(current_state.state, symbol, firsts)), True)
+                    visited[kernels] = next_state = State(frozenset(LR1Parser.closure_lr1(kernels, firsts, suffix_firsts)), True)
                 
                 current_state.add_transition(symbol.Name, next_state)
         
         # automaton.set_formatter(empty_formatter)
         self.automaton = automaton
 
+    def _build_automaton(self):
+        self.build_LR1_automaton()
+
     def _build_parsing_table(self):
         self.is_lr1 = True
-        self.build_LR1_automaton()
+        self._build_automaton()
         
         for i, node in enumerate(self.automaton):
             if self.verbose: print(i, '\t', '\n\t '.join(str(x) for x in node.state), '\n')
@@ -321,4 +790,72 @@ class LR1Parser(ShiftReduceParser):
                     else:
                         self.is_lr1 &= GrammarTools._register(self.goto, idx, next_symbol, 
                                                             node[next_symbol.Name][0].idx)
-                pass
\ No newline at end of file
+                pass
+
+class LALR1Parser(LR1Parser):
+    """
+    LR(1) parser over the LR(0) automaton: states whose kernels share
+    the same core are merged and their lookaheads joined
+    """
+    @property
+    def is_lalr1(self):
+        return self.is_lr1
+
+    def _build_automaton(self):
+        self.build_LALR1_automaton()
+
+    def build_LALR1_automaton(self):
+        G = self.augmentedG = self.G.AugmentedGrammar(True)
+
+        firsts = GrammarTools.compute_firsts(G)
+        firsts[G.EOF] = ContainerSet(G.EOF)
+        suffix_firsts = {}
+        symbols = { symbol: i for i, symbol in enumerate(G.terminals + G.nonTerminals) }
+
+        start_production = G.startSymbol.productions[0]
+        start_center = Item(start_production, 0)
+        start = frozenset([start_center])
+
+        # core -> { center: lookaheads } of the (merged) kernel
+        kernels = { start: { start_center: {G.EOF} } }
+        closures = {}
+        gotos = {}
+
+        pending = [ start ]
+        queued = { start }
+
+        while pending:
+            core = pending.pop()
+            queued.discard(core)
+
+            kernel = [ Item(center.production, center.pos, lookaheads) for center, lookaheads in kernels[core].items() ]
+            closure = closures[core] = LR1Parser.closure_lr1(kernel, firsts, suffix_firsts)
+            transitions = gotos[core] = []
+
+            for symbol, items in LR1Parser.goto_kernels(closure, symbols):
+                next_core = frozenset(item.Center() for item in items)
+                try:
+                    next_kernel = kernels[next_core]
+                except KeyError:
+                    next_kernel = kernels[next_core] = {}
+
+                # (Merge lookaheads, revisit the state if they grew)
+                changed = False
+                for item in items:
+                    lookaheads = next_kernel.setdefault(item.Center(), set())
+                    n = len(lookaheads)
+                    lookaheads.update(item.lookaheads)
+                    changed |= n != len(lookaheads)
+
+                if changed and next_core not in queued:
+                    pending.append(next_core)
+                    queued.add(next_core)
+
+                transitions.append((symbol, next_core))
+
+        states = { core: State(frozenset(closure), True) for core, closure in closures.items() }
+        for core, transitions in gotos.items():
+            for symbol, next_core in transitions:
+                states[core].add_transition(symbol.Name, states[next_core])
+
+        self.automaton = states[start]
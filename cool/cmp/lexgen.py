@@ -0,0 +1,303 @@
+"""
+Table driven lexers generated from regular expressions.
+
+Every rule is compiled into an NFA of automata.State over classes of
+equivalent characters, the union is made deterministic and minimized as
+an automata.DFATable and flattened into the tables that DFALexer scans
+in a single loop.
+"""
+import codecs
+
+from .automata import State
+
+# (Every character out of ASCII behaves the same in the rules, they are all encoded as OTHER)
+OTHER = 128
+ALPHABET = frozenset(range(OTHER + 1))
+
+_ESCAPES = { 'n': '\n', 't': '\t', 'r': '\r', 'f': '\f', 'v': '\v', '0': '\0' }
+
+codecs.register_error('lexgen.other', lambda ex: (bytes([ OTHER ]) * (ex.end - ex.start), ex.end))
+
+
+class RegexError(Exception):
+    @property
+    def text(self):
+        return self.args[0]
+
+
+class _Regex:
+    """
+    Parses the supported syntax: alternation, concatenation, groups, the
+    * + ? operators, classes like [^a-z] and escaped characters. Symbols
+    are kept as sets of character codes
+    """
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.position = 0
+
+    def error(self, message):
+        return RegexError(f'{message} at {self.position} in "{self.pattern}"')
+
+    def peek(self):
+        return self.pattern[self.position] if self.position < len(self.pattern) else None
+
+    def next(self):
+        char = self.peek()
+        if char is None:
+            raise self.error('Unexpected end')
+        self.position += 1
+        return char
+
+    def parse(self):
+        node = self.alternation()
+        if self.peek() is not None:
+            raise self.error(f'Unexpected "{self.peek()}"')
+        return node
+
+    def alternation(self):
+        options = [ self.concatenation() ]
+        while self.peek() == '|':
+            self.position += 1
+            options.append(self.concatenation())
+        return options[0] if len(options) == 1 else ('|', options)
+
+    def concatenation(self):
+        items = []
+        while self.peek() not in (None, '|', ')'):
+            items.append(self.repetition())
+        return items[0] if len(items) == 1 else ('.', items)
+
+    def repetition(self):
+        node = self.atom()
+        while self.peek() in ('*', '+', '?'):
+            node = (self.next(), node)
+        return node
+
+    def atom(self):
+        char = self.next()
+        if char == '(':
+            node = self.alternation()
+            if self.next() != ')':
+                raise self.error('Expected ")"')
+            return node
+        if char == '[':
+            return ('set', self.charset())
+        if char == '.':
+            return ('set', ALPHABET - { ord('\n') })
+        if char == '\\':
+            return ('set', { self.code(self.escaped()) })
+        if char in '*+?)|':
+            raise self.error(f'Unexpected "{char}"')
+        return ('set', { self.code(char) })
+
+    def escaped(self):
+        char = self.next()
+        return _ESCAPES.get(char, char)
+
+    def code(self, char):
+        return ord(char) if ord(char) < OTHER else OTHER
+
+    def charset(self):
+        negated = self.peek() == '^'
+        if negated:
+            self.position += 1
+        codes = set()
+        first = True
+        while first or self.peek() != ']':
+            first = False
+            char = self.next()
+            char = self.escaped() if char == '\\' else char
+            if self.peek() == '-' and self.pattern[self.position + 1:self.position + 2] not in ('', ']'):
+                self.position += 1
+                last = self.next()
+                last = self.escaped() if last == '\\' else last
+                if ord(char) >= OTHER or ord(last) >= OTHER:
+                    raise self.error('Ranges out of ASCII are not supported')
+                codes.update(range(ord(char), ord(last) + 1))
+            else:
+                codes.add(self.code(char))
+        self.position += 1
+        return ALPHABET - codes if negated else codes
+
+
+def _sets(node, output):
+    # (Character sets of a parsed regex)
+    pending = [ node ]
+    while pending:
+        node = pending.pop()
+        if node[0] == 'set':
+            output.append(frozenset(node[1]))
+        elif node[0] in ('|', '.'):
+            pending.extend(node[1])
+        else:
+            pending.append(node[1])
+    return output
+
+
+class _Builder:
+    """
+    Thompson's construction of the NFA of a parsed regex over the
+    character classes
+    """
+    def __init__(self, classes):
+        self.classes = classes
+        self.count = 0
+
+    def state(self):
+        self.count += 1
+        return State(self.count)
+
+    def build(self, node):
+        kind = node[0]
+        if kind == 'set':
+            start, end = self.state(), self.state()
+            for symbol in sorted({ self.classes[x] for x in node[1] }):
+                start.add_transition(symbol, end)
+            return start, end
+        if kind == '.':
+            start, end = self.build(node[1][0])
+            for item in node[1][1:]:
+                first, last = self.build(item)
+                end.add_epsilon_transition(first)
+                end = last
+            return start, end
+        if kind == '|':
+            start, end = self.state(), self.state()
+            for item in node[1]:
+                first, last = self.build(item)
+                start.add_epsilon_transition(first)
+                last.add_epsilon_transition(end)
+            return start, end
+
+        first, last = self.build(node[1])
+        start, end = self.state(), self.state()
+        start.add_epsilon_transition(first)
+        last.add_epsilon_transition(end)
+        if kind in ('*', '?'):
+            start.add_epsilon_transition(end)
+        if kind in ('*', '+'):
+            last.add_epsilon_transition(first)
+        return start, end
+
+
+def _partition(sets):
+    # (Characters that belong to the same sets are the same symbol for the automaton)
+    signatures = {}
+    classes = []
+    for code in range(OTHER + 1):
+        signature = tuple(code in x for x in sets)
+        classes.append(signatures.setdefault(signature, len(signatures)))
+    return classes, len(signatures)
+
+
+def nfa(patterns):
+    """
+    NFA of the alternation of `patterns`, the final state of the i-th one
+    is labeled i. Returns the start state, the label of every final state
+    and the class of every character code (OTHER for those out of ASCII)
+    """
+    parsed = [ _Regex(pattern).parse() for pattern in patterns ]
+    classes, _ = _partition(list({ x for node in parsed for x in _sets(node, []) }))
+
+    builder = _Builder(classes)
+    start = builder.state()
+    finals = {}
+    for rule, node in enumerate(parsed):
+        first, last = builder.build(node)
+        last.final = True
+        finals[last] = rule
+        start.add_epsilon_transition(first)
+    return start, finals, classes
+
+
+def dfa(patterns):
+    """
+    Minimized DFATable of the alternation of `patterns` over the character
+    classes, a state is labeled with the first pattern that it matches
+    """
+    start, finals, classes = nfa(patterns)
+
+    def label(state):
+        matched = [ finals[x] for x in state.state if x in finals ]
+        return min(matched) if matched else None
+
+    return start.to_deterministic().to_table(label).minimize(), classes
+
+
+class DFALexer:
+    """
+    Scans a text with a list of (name, pattern) rules. Like a regex made
+    of the alternation of the rules, at every position the first rule that
+    matches wins and takes its longest match; the rules named in `skip`
+    match but yield nothing. A character that starts no match is passed to
+    `error(text, position)` and skipped.
+
+    The tables are flat lists: the state `s` is stored as the offset
+    `s * width` and the next state is `transitions[offset + symbol]`,
+    -1 when there is none
+    """
+    def __init__(self, rules, skip=(), error=None):
+        self.names = [ name for name, _ in rules ]
+        self.error = error
+
+        table, classes = dfa([ pattern for _, pattern in rules ])
+        self.width = max(classes) + 1
+        self.classes = bytes(classes) + bytes([ classes[OTHER] ]) * (256 - len(classes))
+        self.states = table.states
+
+        # (Columns of the table are the classes that have transitions)
+        rows = [ [ -1 ] * self.width for _ in range(table.states) ]
+        for state in range(table.states):
+            for column, symbol in enumerate(table.symbols):
+                rows[state][symbol] = table.transitions[state * len(table.symbols) + column]
+
+        none = len(rules)
+        self.transitions = [ -1 if x < 0 else x * self.width for row in rows for x in row ]
+        self.accept = [ none ] * len(self.transitions)
+        for state, label in enumerate(table.labels):
+            self.accept[state * self.width] = none if label is None else label
+
+        # (Best rule that can still match from every state, the scan stops when it can not improve)
+        reachable = [ none if x is None else x for x in table.labels ]
+        changed = True
+        while changed:
+            changed = False
+            for state, row in enumerate(rows):
+                best = min([ reachable[state] ] + [ reachable[x] for x in row if x >= 0 ])
+                if best < reachable[state]:
+                    reachable[state] = best
+                    changed = True
+        self.reachable = [ none ] * len(self.transitions)
+        for state, best in enumerate(reachable):
+            self.reachable[state * self.width] = best
+
+        self.skip = [ name in skip for name in self.names ]
+
+    def scan(self, text):
+        """
+        Yields (rule, start, end) for every match that is not skipped
+        """
+        data = text.encode('ascii', 'lexgen.other').translate(self.classes)
+        transitions, accept, reachable, skip = self.transitions, self.accept, self.reachable, self.skip
+        none = len(self.names)
+        length = len(data)
+        position = 0
+        while position < length:
+            state, index = 0, position
+            rule, end = none, position
+            while index < length:
+                state = transitions[state + data[index]]
+                if state < 0 or reachable[state] > rule:
+                    break
+                index += 1
+                if accept[state] <= rule:
+                    rule, end = accept[state], index
+
+            if rule == none:
+                if self.error is not None:
+                    self.error(text, position)
+                position += 1
+                continue
+            if not skip[rule]:
+                yield rule, position, end
+            position = end
@@ -1,5 +1,3 @@
-import itertools as itt
-
 class SemanticError(Exception):
     @property
     def text(self):
@@ -39,9 +37,24 @@ class Type:
         self.name = name
         self.attributes = []
         self.methods = {}
+        # Hierarchy of the context that holds the type
+        self.hierarchy = None
+        self.position = None
+        self.flattened = None
         self.parent = None
         self.sealed = sealed
 
+    @property
+    def parent(self):
+        return self._parent
+
+    @parent.setter
+    def parent(self, parent):
+        self._parent = parent
+        self.members_changed()
+        if self.hierarchy is not None:
+            self.hierarchy.invalidate()
+
     def set_parent(self, parent):
         if self.parent is not None:
             raise SemanticError(f'Parent type is already set for {self.name}.')
@@ -53,6 +66,10 @@ class Type:
         if self == other:
             return other
 
+        hierarchy = self.hierarchy
+        if hierarchy is not None and hierarchy.indexes(self, other):
+            return hierarchy.lowest_common_ancestor(self, other)
+
         t1 = [self]
         while t1[-1] != None:
             t1.append(t1[-1].parent)
@@ -67,37 +84,82 @@ class Type:
 
         return t1[-1]
 
+    def members(self):
+        """
+        Flattened tables of the attributes and methods of the type,
+        inherited ones included, as dicts name -> (slot, member).
+        Inherited members keep the slot they have in the parent and an
+        overriding method takes the slot of the one it overrides.
+        """
+        generation = self.hierarchy.generation if self.hierarchy is not None else None
+        if self.flattened is not None and generation is not None and self.flattened[0] == generation:
+            return self.flattened
+
+        # (Up to the first ancestor with valid tables, without looping on a cyclic heritage)
+        chain, seen = [ self ], { id(self) }
+        parent = self.parent
+        while parent is not None and id(parent) not in seen:
+            parent_generation = parent.hierarchy.generation if parent.hierarchy is not None else None
+            if parent.flattened is not None and parent_generation is not None and parent.flattened[0] == parent_generation:
+                break
+            chain.append(parent)
+            seen.add(id(parent))
+            parent = parent.parent
+
+        flattened = parent.flattened if parent is not None and id(parent) not in seen else (None, {}, {})
+        for typex in reversed(chain):
+            _, attributes, methods = flattened
+            attributes, methods = dict(attributes), dict(methods)
+            for attr in typex.attributes:
+                attributes.setdefault(attr.name, (len(attributes), attr))
+            for name, method in typex.methods.items():
+                slot = methods[name][0] if name in methods else len(methods)
+                methods[name] = (slot, method)
+            generation = typex.hierarchy.generation if typex.hierarchy is not None else None
+            flattened = typex.flattened = (generation, attributes, methods)
+        return flattened
+
+    def lookup_attribute(self, name:str):
+        entry = self.members()[1].get(name)
+        return None if entry is None else entry[1]
+
+    def lookup_method(self, name:str):
+        entry = self.members()[2].get(name)
+        return None if entry is None else entry[1]
+
+    def attribute_slot(self, name:str):
+        entry = self.members()[1].get(name)
+        return None if entry is None else entry[0]
+
+    def method_slot(self, name:str):
+        entry = self.members()[2].get(name)
+        return None if entry is None else entry[0]
+
     def get_attribute(self, name:str):
-        try:
-            return next(attr for attr in self.attributes if attr.name == name)
-        except StopIteration:
-            if self.parent is None:
-                raise SemanticError(f'Attribute "{name}" is not defined in {self.name}.')
-            try:
-                return self.parent.get_attribute(name)
-            except SemanticError:
-                raise SemanticError(f'Attribute "{name}" is not defined in {self.name}.')
+        attribute = self.lookup_attribute(name)
+        if attribute is None:
+            raise SemanticError(f'Attribute "{name}" is not defined in {self.name}.')
+        return attribute
 
     def define_attribute(self, name:str, typex):
-        try:
-            self.get_attribute(name)
-        except SemanticError:
-            attribute = Attribute(name, typex)
-            self.attributes.append(attribute)
-            return attribute
-        else:
-            raise SemanticError(f'Attribute "{name}" is already defined in {self.name}.')
+        # (Walks the parents, while the types are being built the tables are outdated on every definition)
+        owner, seen = self, set()
+        while owner is not None and id(owner) not in seen:
+            if any(attr.name == name for attr in owner.attributes):
+                raise SemanticError(f'Attribute "{name}" is already defined in {self.name}.')
+            seen.add(id(owner))
+            owner = owner.parent
+
+        attribute = Attribute(name, typex)
+        self.attributes.append(attribute)
+        self.members_changed()
+        return attribute
 
     def get_method(self, name:str):
-        try:
-            return self.methods[name]
-        except KeyError:
-            if self.parent is None:
-                raise SemanticError(f'Method "{name}" is not defined in {self.name}.')
-            try:
-                return self.parent.get_method(name)
-            except SemanticError:
-                raise SemanticError(f'Method "{name}" is not defined in {self.name}.')
+        method = self.lookup_method(name)
+        if method is None:
+            raise SemanticError(f'Method "{name}" is not defined in {self.name}.')
+        return method
 
     def define_method(self, name:str, param_names:list, param_types:list, return_type):
         if name in self.methods:
@@ -105,10 +167,24 @@ class Type:
             # raise SemanticError(f'Method "{name}" already defined in {self.name} with a different signature.')
 
         method = self.methods[name] = Method(name, param_names, param_types, return_type)
+        self.members_changed()
         return method
 
+    def members_changed(self):
+        self.flattened = None
+        if self.hierarchy is not None:
+            self.hierarchy.generation += 1
+
     def conforms_to(self, other):
-        return other.bypass() or self == other or self.parent is not None and self.parent.conforms_to(other)
+        if other.bypass():
+            return True
+        hierarchy = self.hierarchy
+        if hierarchy is not None and hierarchy.indexes(self, other):
+            # (Euler tour, other's interval contains self's)
+            _, start, end, _, _ = other.position
+            _, enter, leave, _, _ = self.position
+            return start <= enter and leave <= end
+        return self == other or self.parent is not None and self.parent.conforms_to(other)
 
     def bypass(self):
         return False
@@ -177,20 +253,116 @@ class ErrorType(Type):
     def __eq__(self, other):
         return isinstance(other, Type)
 
+class Hierarchy:
+    """
+    Index of the inheritance forest of a Context.
+
+    Every type reachable from a root gets as `position` the tuple
+    (version, enter, leave, depth, ancestors) where [enter, leave] is its
+    interval in an Euler tour and ancestors[k] its 2^k-th ancestor, so
+    subtype tests take O(1) and joins O(log n). The index is rebuilt on
+    the next query after a type is added or a parent changes; types in
+    an inheritance cycle are left out of it.
+    """
+    def __init__(self, context):
+        self.context = context
+        self.version = 0
+        self.dirty = True
+        # changes on every parent or member, see Type.members
+        self.generation = 0
+
+    def invalidate(self):
+        self.dirty = True
+        self.generation += 1
+
+    def build(self):
+        self.version += 1
+        self.dirty = False
+
+        types = [ x for x in self.context.types.values() if not x.bypass() ]
+        children = { x.name: [] for x in types }
+        roots = []
+        for typex in types:
+            parent = typex.parent
+            if parent is None:
+                roots.append(typex)
+            elif parent.name in children and self.context.types[parent.name] is parent:
+                children[parent.name].append(typex)
+
+        clock = 0
+        for root in roots:
+            root.position = (self.version, clock, None, 0, [])
+            pending = [ (root, iter(children[root.name])) ]
+            while pending:
+                typex, remaining = pending[-1]
+                child = next(remaining, None)
+                if child is None:
+                    pending.pop()
+                    version, enter, _, depth, ancestors = typex.position
+                    typex.position = (version, enter, clock, depth, ancestors)
+                    clock += 1
+                    continue
+                clock += 1
+                depth = len(pending)
+                ancestors = [ typex ]
+                while len(ancestors) < depth.bit_length():
+                    ancestors.append(ancestors[-1].position[4][len(ancestors) - 1])
+                child.position = (self.version, clock, None, depth, ancestors)
+                pending.append((child, iter(children[child.name])))
+
+    def indexes(self, a, b):
+        # (The positions of types of another context are intervals of another tour)
+        if a.hierarchy is not self or b.hierarchy is not self:
+            return False
+        if self.dirty:
+            self.build()
+        position_a, position_b = a.position, b.position
+        return position_a is not None and position_b is not None and \
+            position_a[0] == position_b[0] == self.version
+
+    def lowest_common_ancestor(self, a, b):
+        _, _, _, depth_a, _ = a.position
+        _, _, _, depth_b, _ = b.position
+        if depth_a < depth_b:
+            a, b, depth_a, depth_b = b, a, depth_b, depth_a
+
+        # (Binary lifting, first to the same depth and then to the ancestor)
+        difference, k = depth_a - depth_b, 0
+        while difference:
+            if difference & 1:
+                a = a.position[4][k]
+            difference >>= 1
+            k += 1
+        if a is b:
+            return a
+
+        for k in reversed(range(depth_b.bit_length())):
+            ancestors_a, ancestors_b = a.position[4], b.position[4]
+            if k < len(ancestors_a) and ancestors_a[k] is not ancestors_b[k]:
+                a, b = ancestors_a[k], ancestors_b[k]
+        # different roots have no common ancestor
+        return a.parent if a.parent is b.parent else None
+
+
 class Context:
     def __init__(self):
         self.types = {}
+        self.hierarchy = Hierarchy(self)
 
     def create_type(self, name:str):
         if name in self.types:
             raise SemanticError(f'Type with the same name ({name}) already in context.')
         typex = self.types[name] = Type(name)
+        typex.hierarchy = self.hierarchy
+        self.hierarchy.invalidate()
         return typex
 
     def add_type(self, typex):
         if typex.name in self.types:
             raise SemanticError(f'Type with the same name ({typex.name}) already in context.')
         self.types[typex.name] = typex
+        typex.hierarchy = self.hierarchy
+        self.hierarchy.invalidate()
         return typex
 
     def get_type(self, name:str):
@@ -259,32 +431,53 @@ class VariableInfo:
 class Scope:
     def __init__(self, parent=None):
         self.locals = []
+        # name -> position of its first definition in locals
+        self.positions = {}
         self.parent = parent
         self.children = []
         self.index = 0 if parent is None else len(parent)
+        # owner -> scope, shared by the whole tree
+        self.owners = {} if parent is None else parent.owners
 
     def __len__(self):
         return len(self.locals)
 
-    def create_child(self):
+    def create_child(self, owner=None):
+        """
+        Creates a child scope, registered for `scope_of` under `owner`
+        (the node or the token that introduces its bindings) when given
+        """
         child = Scope(self)
         self.children.append(child)
+        if owner is not None:
+            self.owners[owner] = child
         return child
 
+    def scope_of(self, owner):
+        return self.owners.get(owner)
+
     def define_variable(self, vname, vtype):
         info = VariableInfo(vname, vtype)
+        self.positions.setdefault(vname, len(self.locals))
         self.locals.append(info)
         return info
 
     def find_variable(self, vname, index=None):
-        locals = self.locals if index is None else itt.islice(self.locals, index)
-        try:
-            return next(x for x in locals if x.name == vname)
-        except StopIteration:
-            return self.parent.find_variable(vname, self.index) if self.parent is not None else None
+        """
+        The first definition of `vname` among the first `index` locals
+        (all of them when None), then in the parent among the locals
+        defined before this scope was created, and so on.
+        """
+        scope = self
+        while scope is not None:
+            position = scope.positions.get(vname)
+            if position is not None and (index is None or position < index):
+                return scope.locals[position]
+            index, scope = scope.index, scope.parent
+        return None
 
     def is_defined(self, vname):
         return self.find_variable(vname) is not None
 
     def is_local(self, vname):
-        return any(True for x in self.locals if x.name == vname)
\ No newline at end of file
+        return vname in self.positions
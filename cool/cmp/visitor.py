@@ -21,6 +21,7 @@
 # THE SOFTWARE.
 
 import inspect
+from types import MethodType
 
 __all__ = ['on', 'when']
 
@@ -36,40 +37,124 @@ def when(param_type):
     frame = inspect.currentframe().f_back
     func_name = fn.func_name if 'func_name' in dir(fn) else fn.__name__
     dispatcher = frame.f_locals[func_name]
-    if not isinstance(dispatcher, Dispatcher):
-      dispatcher = dispatcher.dispatcher
     dispatcher.add_target(param_type, fn)
-    def ff(*args, **kw):
-      return dispatcher(*args, **kw)
-    ff.dispatcher = dispatcher
-    return ff
+    # the dispatcher itself is the method, there is no wrapper to go through
+    return dispatcher
   return f
 
 
 class Dispatcher(object):
+  """
+  Calls the target registered for the class of the dispatched argument or,
+  failing that, for its nearest base class in the MRO. The resolved target
+  of every class is cached; the function decorated with `on` is the
+  target when no class in the MRO has one.
+
+  A target of a method dispatcher may be a generator: instead of calling
+  the visitor on a child it yields the arguments of that call (but self),
+  `yield node.left, scope`, and receives its result. The dispatcher runs
+  those generators from an explicit stack, so the depth of the visited
+  tree is not bound by the recursion limit.
+  """
   def __init__(self, param_name, fn):
     frame = inspect.currentframe().f_back.f_back
     top_level = frame.f_locals == frame.f_globals
     self.param_index = self.__argspec(fn).args.index(param_name)
     self.param_name = param_name
+    self.default = fn
     self.targets = {}
+    self.cache = {}
+    # class -> (target, whether it is a generator), as run by the trampoline
+    self.steps = {}
+    self.__name__ = fn.__name__
+    self.__doc__ = fn.__doc__
+    self.method = self.__specialize() if self.param_index == 1 else self
+
+  def __specialize(self):
+    # (The usual `def visit(self, node, ...)`, bound as a plain function)
+    cache, resolve = self.cache, self.resolve
+    def method(instance, node, *args, **kw):
+      try:
+        d = cache[node.__class__]
+      except KeyError:
+        d = resolve(node.__class__)
+      return d(instance, node, *args, **kw)
+    return method
+
+  def __get__(self, instance, owner=None):
+    if instance is None:
+      return self
+    return MethodType(self.method, instance)
 
   def __call__(self, *args, **kw):
     typ = args[self.param_index].__class__
-    d = self.targets.get(typ)
-    if d is not None:
-      return d(*args, **kw)
-    else:
-      issub = issubclass
-      t = self.targets
-      ks = t.keys()
-      ans = [t[k](*args, **kw) for k in ks if issub(typ, k)]
-      if len(ans) == 1:
-        return ans.pop()
-      return ans
+    try:
+      d = self.cache[typ]
+    except KeyError:
+      d = self.resolve(typ)
+    return d(*args, **kw)
+
+  def resolve(self, typ):
+    d, generator = self.step(typ)
+    if generator:
+      d = self.__trampoline(d)
+    self.cache[typ] = d
+    return d
+
+  def step(self, typ):
+    targets = self.targets
+    d = next((targets[k] for k in typ.__mro__ if k in targets), self.default)
+    step = self.steps[typ] = (d, inspect.isgeneratorfunction(d))
+    return step
+
+  def __trampoline(self, target):
+    steps, index = self.steps, self.param_index - 1
+    step = self.step
+
+    def run(instance, *args, **kw):
+      stack = [ target(instance, *args, **kw) ]
+      value = error = None
+      while stack:
+        try:
+          if error is None:
+            args = stack[-1].send(value)
+          else:
+            args = stack[-1].throw(error)
+            error = None
+        except StopIteration as ex:
+          stack.pop()
+          value, error = ex.value, None
+          continue
+        except BaseException as ex:
+          # (Raised into the visit that yielded this one)
+          stack.pop()
+          value, error = None, ex
+          continue
+
+        if args.__class__ is not tuple:
+          args = (args,)
+        try:
+          d, generator = steps[args[index].__class__]
+        except KeyError:
+          d, generator = step(args[index].__class__)
+        if generator:
+          stack.append(d(instance, *args))
+          value = None
+        else:
+          try:
+            value = d(instance, *args)
+          except BaseException as ex:
+            value, error = None, ex
+
+      if error is not None:
+        raise error
+      return value
+    return run
 
   def add_target(self, typ, target):
     self.targets[typ] = target
+    self.cache.clear()
+    self.steps.clear()
 
   @staticmethod
   def __argspec(fn):
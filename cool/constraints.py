@@ -0,0 +1,510 @@
+from .cmp import visitor, SelfType, AutoType, ErrorType, SemanticError
+from .ast import *
+
+#Inferencia de AUTO_TYPE por restricciones
+#Una sola pasada sobre el ast extrae las restricciones de subtipo entre expresiones
+#y variables AUTO_TYPE, y luego se resuelven con una lista de trabajo sobre la
+#jerarquia de clases: la cota inferior de cada variable es el join de los tipos
+#que fluyen hacia ella y la cota superior el meet de los tipos que se le exigen
+
+class TypeVariable:
+    """
+    Unknown type of an AUTO_TYPE variable, attribute, param or return,
+    or of an expression whose type depends on them.
+
+    `lower` is the join of the types flowing into it and `upper` the
+    most specific type required from it.
+    """
+    def __init__(self, index, description, token=None, apply=None):
+        self.index = index
+        self.description = description
+        self.token = token
+        self.apply = apply
+        self.lower = None
+        self.upper = None
+        self.successors = []
+        self.predecessors = []
+        self.conflict = None
+        self.type = None
+
+    def __str__(self):
+        return self.description
+
+    def __repr__(self):
+        return f'<{self.description}>'
+
+
+def join(a, b):
+    if a is None:
+        return b
+    ancestors = set()
+    while a is not None and a not in ancestors:
+        ancestors.add(a)
+        a = a.parent
+    while b is not None and b not in ancestors:
+        b = b.parent
+    return b
+
+
+class ConstraintGraph:
+    def __init__(self):
+        self.variables = []
+        # variables whose lower bound grew / upper bound shrank
+        self.forward = []
+        self.backward = []
+
+    def variable(self, description, token=None, apply=None):
+        var = TypeVariable(len(self.variables), description, token, apply)
+        self.variables.append(var)
+        return var
+
+    def subtype(self, sub, sup):
+        """
+        Adds the constraint `sub <= sup`, each one a Type or a TypeVariable
+        """
+        if sub is None or sup is None:
+            return
+        if isinstance(sub, TypeVariable):
+            if isinstance(sup, TypeVariable):
+                if sub is not sup:
+                    sub.successors.append(sup)
+                    sup.predecessors.append(sub)
+                    self.forward.append(sub)
+                    self.backward.append(sup)
+            else:
+                self._restrict(sub, sup)
+        elif isinstance(sup, TypeVariable):
+            self._widen(sup, sub)
+
+    def _widen(self, var, typex):
+        if typex.bypass() or isinstance(typex, ErrorType):
+            return
+        lower = join(var.lower, typex)
+        if lower is not var.lower:
+            if lower is None:
+                var.conflict = var.conflict or f'"{var.lower.name}" and "{typex.name}" have no common ancestor'
+                return
+            var.lower = lower
+            self.forward.append(var)
+
+    def _restrict(self, var, typex):
+        if typex.bypass() or isinstance(typex, ErrorType):
+            return
+        upper = var.upper
+        if upper is None or typex.conforms_to(upper) and typex is not upper:
+            var.upper = typex
+            self.backward.append(var)
+        elif not upper.conforms_to(typex):
+            var.conflict = var.conflict or f'it must conform to both "{upper.name}" and "{typex.name}"'
+
+    def propagate(self):
+        """
+        Propagates lower bounds along `<=` and upper bounds against it
+        until nothing changes, touching only variables whose bounds changed
+        """
+        while self.forward or self.backward:
+            while self.forward:
+                var = self.forward.pop()
+                if var.lower is not None:
+                    for successor in var.successors:
+                        self._widen(successor, var.lower)
+            while self.backward:
+                var = self.backward.pop()
+                if var.upper is not None:
+                    for predecessor in var.predecessors:
+                        self._restrict(predecessor, var.upper)
+
+    def solve(self):
+        self.propagate()
+        for var in self.variables:
+            if var.lower is not None:
+                if var.upper is not None and not var.lower.conforms_to(var.upper):
+                    var.conflict = var.conflict or f'"{var.lower.name}" does not conform to "{var.upper.name}"'
+                var.type = var.lower
+            else:
+                var.type = var.upper
+            if var.conflict:
+                var.type = None
+
+    def cycle_of(self, var):
+        """
+        The variables in the same strongly connected component as `var`,
+        in the order they are reached from it
+        """
+        forward = self._reachable(var, lambda x: x.successors)
+        backward = self._reachable(var, lambda x: x.predecessors)
+        return [ x for x in forward if x in backward ]
+
+    @staticmethod
+    def _reachable(var, edges):
+        seen = { var: None }
+        pending = [ var ]
+        while pending:
+            for other in edges(pending.pop()):
+                if other not in seen:
+                    seen[other] = None
+                    pending.append(other)
+        return list(seen)
+
+
+class ConstraintInferer:
+    """
+    Alternative to TypeInfererVisitor: one pass over the AST builds the
+    ConstraintGraph, which is then solved. Dispatches on receivers of
+    unknown type are resolved once their receiver has a solution.
+    """
+    def __init__(self, context, errors=[], infrencias=[]):
+        self.context = context
+        self.errors = errors
+        self.infrencias = infrencias
+        self.current_type = None
+        self.current_method = None
+        self.graph = ConstraintGraph()
+        # VariableInfo -> TypeVariable
+        self.variables = {}
+        # return_info of a Method -> ([param terms], return term)
+        self.signatures = {}
+        self.dispatches = []
+        # method name -> the only class that introduces it, if any
+        self.definers = {}
+
+        # search built-in types
+        self.object_type = self.context.get_type('Object')
+        self.int_type = self.context.get_type('Int')
+        self.string_type = self.context.get_type('String')
+        self.bool_type = self.context.get_type('Bool')
+
+    def infer(self, node, scope):
+        self.visit(node, scope)
+
+        self.graph.solve()
+        while self._resolve_dispatches():
+            self.graph.solve()
+
+        self._report()
+        return len(self.graph.variables)
+
+    def _term(self, var):
+        try:
+            return self.variables[var]
+        except KeyError:
+            return self.current_type if isinstance(var.type, SelfType) else var.type
+
+    def _concrete(self, typex):
+        return self.current_type if isinstance(typex, SelfType) else typex
+
+    def _signature(self, typex, method):
+        try:
+            return self.signatures[method.return_info]
+        except KeyError:
+            pass
+
+        params = []
+        for i, (pname, ptype) in enumerate(zip(method.param_names, method.param_types)):
+            if isinstance(ptype, AutoType):
+                def apply(t, method=method, i=i, pname=pname):
+                    method.param_types[i] = t
+                    return 'On method "%s" of class "%s", param "%s": type "%s"' % (method.name, typex.name, pname, t.name)
+                ptype = self.graph.variable(f'param "{pname}" of method "{method.name}" of class "{typex.name}"', apply=apply)
+            params.append(ptype)
+
+        return_type = method.return_type
+        if isinstance(return_type, AutoType):
+            def apply(t, method=method):
+                method.return_type = t
+                method.return_info.type = t
+                method.return_info.infered = True
+                return 'Return of method "%s" in class "%s", type "%s"' % (method.name, typex.name, t.name)
+            return_type = self.graph.variable(f'return of method "{method.name}" of class "{typex.name}"', apply=apply)
+
+        signature = self.signatures[method.return_info] = (params, return_type)
+        return signature
+
+    def _owner(self, typex, name):
+        while typex is not None and name not in typex.methods:
+            typex = typex.parent
+        return typex
+
+    def _definer(self, name):
+        try:
+            return self.definers[name]
+        except KeyError:
+            pass
+        definers = [ x for x in self.context.types.values() if name in x.methods and (x.parent is None or x.parent.lookup_method(name) is None) ]
+        definer = self.definers[name] = definers[0] if len(definers) == 1 else None
+        return definer
+
+    def _dispatch(self, obj_type, name, args, token):
+        # (Constraints of a call once the type of the receiver is known)
+        method = obj_type.lookup_method(name)
+        if method is None:
+            return ErrorType()
+
+        params, return_type = self._signature(self._owner(obj_type, name), method)
+        if len(params) == len(args):
+            for arg, param in zip(args, params):
+                self.graph.subtype(arg, param)
+
+        if isinstance(return_type, SelfType):
+            return obj_type
+        return return_type
+
+    def _resolve_dispatches(self):
+        resolved = False
+        pending, self.dispatches = self.dispatches, []
+        for receiver, name, args, result, current_type, token in pending:
+            if receiver.type is None:
+                self.dispatches.append((receiver, name, args, result, current_type, token))
+                continue
+            self.current_type = current_type
+            return_type = self._dispatch(receiver.type, name, args, token)
+            # the result of the call is the return of the method
+            self.graph.subtype(return_type, result)
+            self.graph.subtype(result, return_type)
+            resolved = True
+        return resolved
+
+    def _join(self, terms, description):
+        terms = [ x for x in terms if x is not None ]
+        if all(not isinstance(x, TypeVariable) for x in terms):
+            result = None
+            for x in terms:
+                if x.bypass() or isinstance(x, ErrorType):
+                    return x
+                result = join(result, x)
+            return result
+        result = self.graph.variable(description)
+        for x in terms:
+            self.graph.subtype(x, result)
+        return result
+
+    def _report(self):
+        # (Source order, signatures are created at their first call)
+        located = lambda var: (var.token.line, var.token.column, var.index) if var.token else (0, 0, var.index)
+        reported = set()
+        for var in sorted(self.graph.variables, key=located):
+            if var in reported:
+                continue
+            if var.conflict:
+                cycle = self.graph.cycle_of(var)
+                reported.update(cycle)
+                where = 'Error on Ln %d, Col %d: ' % (var.token.line, var.token.column) if var.token else ''
+                message = f'Cannot infer the type of {var.description}: {var.conflict}'
+                if len(cycle) > 1:
+                    message += '; constraint cycle: ' + ' <= '.join(str(x) for x in cycle + [var])
+                self.errors.append(where + message)
+            elif var.type is not None and var.apply is not None:
+                self.infrencias.append(var.apply(var.type))
+
+    # children are visited by yielding their arguments, see cmp.visitor.Dispatcher
+    @visitor.on('node')
+    def visit(self, node, scope):
+        pass
+
+    @visitor.when(Program)
+    def visit(self, node, scope):
+        for declaration in node.declarations:
+            yield declaration, scope.scope_of(declaration)
+
+    @visitor.when(ClassDeclaration)
+    def visit(self, node, scope):
+        self.current_type = self.context.get_type(node.id.lex)
+
+        declarations = { x.id.lex: x for x in node.features if isinstance(x, AttrDeclaration) }
+        for attr, var in zip(self.current_type.attributes, scope.locals):
+            if not var.infered:
+                def apply(t, attr=attr, var=var, typex=self.current_type):
+                    attr.type = var.type = t
+                    var.infered = True
+                    return 'On class "%s", attribute "%s": type "%s"' % (typex.name, attr.name, t.name)
+                self.variables[var] = self.graph.variable(f'attribute "{attr.name}" of class "{self.current_type.name}"', declarations[attr.name].id, apply)
+
+        for feature in node.features:
+            yield feature, scope
+
+    @visitor.when(AttrDeclaration)
+    def visit(self, node, scope):
+        if node.expression:
+            expr_type = yield node.expression, scope
+            self.graph.subtype(expr_type, self._term(scope.find_variable(node.id.lex)))
+
+    @visitor.when(FuncDeclaration)
+    def visit(self, node, scope):
+        self.current_method = self.current_type.get_method(node.id.lex)
+        scope = scope.scope_of(node)
+        params, return_type = self._signature(self.current_type, self.current_method)
+
+        for (idx, _), var, param in zip(node.params, scope.locals[1:], params):
+            if isinstance(param, TypeVariable):
+                param.token = idx
+                self.variables[var] = param
+                apply = param.apply
+                def apply_var(t, var=var, apply=apply):
+                    var.type = t
+                    var.infered = True
+                    return apply(t)
+                param.apply = apply_var
+        if isinstance(return_type, TypeVariable):
+            return_type.token = node.body
+
+        body_type = yield node.body, scope
+        self.graph.subtype(body_type, self._concrete(return_type))
+
+    @visitor.when(IfThenElse)
+    def visit(self, node, scope):
+        self.graph.subtype((yield node.condition, scope), self.bool_type)
+        if_type = yield node.if_body, scope
+        else_type = yield node.else_body, scope
+        return self._join([if_type, else_type], 'if expression')
+
+    @visitor.when(WhileLoop)
+    def visit(self, node, scope):
+        self.graph.subtype((yield node.condition, scope), self.bool_type)
+        yield node.body, scope
+        return self.object_type
+
+    @visitor.when(Block)
+    def visit(self, node, scope):
+        result = None
+        for expr in node.expressions:
+            result = yield expr, scope
+        return result
+
+    @visitor.when(LetIn)
+    def visit(self, node, scope):
+        scope = scope.scope_of(node)
+        for (idx, typex, expr), var in zip(node.let_body, scope.locals):
+            if not var.infered:
+                def apply(t, idx=idx, typex=typex, var=var):
+                    var.type = t
+                    var.infered = True
+                    typex.name = t.name
+                    return 'Error on Ln %d, Col %d: ' % (idx.line, idx.column) + 'Varible "%s", type "%s"' % (var.name, t.name)
+                self.variables[var] = self.graph.variable(f'variable "{idx.lex}"', idx, apply)
+            if expr:
+                self.graph.subtype((yield expr, scope.scope_of(idx)), self._term(var))
+
+        return (yield node.in_body, scope)
+
+    @visitor.when(CaseOf)
+    def visit(self, node, scope):
+        yield node.expression, scope
+        branches = []
+        for idx, _, expr in node.branches:
+            branches.append((yield expr, scope.scope_of(idx)))
+        return self._join(branches, 'case expression')
+
+    @visitor.when(Assign)
+    def visit(self, node, scope):
+        expr_type = yield node.expression, scope
+        var = scope.find_variable(node.id.lex)
+        if var is not None:
+            self.graph.subtype(expr_type, self._term(var))
+        return expr_type
+
+    @visitor.when(Not)
+    def visit(self, node, scope):
+        self.graph.subtype((yield node.expression, scope), self.bool_type)
+        return self.bool_type
+
+    @visitor.when(LessEqual)
+    def visit(self, node, scope):
+        self.graph.subtype((yield node.left, scope), self.int_type)
+        self.graph.subtype((yield node.right, scope), self.int_type)
+        return self.bool_type
+
+    @visitor.when(Less)
+    def visit(self, node, scope):
+        self.graph.subtype((yield node.left, scope), self.int_type)
+        self.graph.subtype((yield node.right, scope), self.int_type)
+        return self.bool_type
+
+    @visitor.when(Equal)
+    def visit(self, node, scope):
+        left = yield node.left, scope
+        right = yield node.right, scope
+
+        # basic types can only be compared with themselves
+        basics = (self.int_type, self.string_type, self.bool_type)
+        if left in basics:
+            self.graph.subtype(right, left)
+        elif right in basics:
+            self.graph.subtype(left, right)
+        return self.bool_type
+
+    @visitor.when(Arithmetic)
+    def visit(self, node, scope):
+        self.graph.subtype((yield node.left, scope), self.int_type)
+        self.graph.subtype((yield node.right, scope), self.int_type)
+        return self.int_type
+
+    @visitor.when(IsVoid)
+    def visit(self, node, scope):
+        yield node.expression, scope
+        return self.bool_type
+
+    @visitor.when(Complement)
+    def visit(self, node, scope):
+        self.graph.subtype((yield node.expression, scope), self.int_type)
+        return self.int_type
+
+    @visitor.when(FunctionCall)
+    def visit(self, node, scope):
+        obj_type = yield node.obj, scope
+        args = []
+        for arg in node.args:
+            args.append((yield arg, scope))
+
+        if node.type:
+            try:
+                node_type = self.context.get_type(node.type.lex)
+            except SemanticError:
+                return ErrorType()
+            self.graph.subtype(obj_type, node_type)
+            obj_type = node_type
+
+        if isinstance(obj_type, TypeVariable):
+            # the receiver must conform to the class that introduces the method
+            definer = self._definer(node.id.lex)
+            if definer is not None:
+                self.graph.subtype(obj_type, definer)
+            result = self.graph.variable(f'call to "{node.id.lex}"')
+            self.dispatches.append((obj_type, node.id.lex, args, result, self.current_type, node.id))
+            return result
+
+        if obj_type is None or obj_type.bypass() or isinstance(obj_type, ErrorType):
+            return ErrorType()
+        return self._dispatch(obj_type, node.id.lex, args, node.id)
+
+    @visitor.when(MemberCall)
+    def visit(self, node, scope):
+        args = []
+        for arg in node.args:
+            args.append((yield arg, scope))
+        return self._dispatch(self.current_type, node.id.lex, args, node.id)
+
+    @visitor.when(New)
+    def visit(self, node, scope):
+        try:
+            return self._concrete(self.context.get_type(node.type.lex))
+        except SemanticError:
+            return ErrorType()
+
+    @visitor.when(Integer)
+    def visit(self, node, scope):
+        return self.int_type
+
+    @visitor.when(String)
+    def visit(self, node, scope):
+        return self.string_type
+
+    @visitor.when(Bool)
+    def visit(self, node, scope):
+        return self.bool_type
+
+    @visitor.when(Id)
+    def visit(self, node, scope):
+        var = scope.find_variable(node.token.lex)
+        if var is None:
+            return ErrorType()
+        return self._term(var)
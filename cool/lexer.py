@@ -1,4 +1,9 @@
-import ply.lex as lex
+try:
+	import ply.lex as lex
+except ImportError:
+	lex = None
+
+from .cmp.lexgen import DFALexer
 from .cmp.utils import Token
 from .parser import CoolGrammar
 
@@ -68,7 +73,7 @@ def t_BOOL(t):
 	return t
 
 def t_COMMENT(t):
-	r'--[^\n]+\n|\(\*[^(\*\))]+\*\)'
+	r'--[^\n]*|\(\*([^*]|\*+[^*)])*\*+\)'
 	pass  # Discard comments
 
 # Other tokens with precedence before TYPE and ID
@@ -113,22 +118,112 @@ tokens_dict['EQUAL'] = CoolGrammar['=']
 tokens_dict['INT_COMPLEMENT'] = CoolGrammar['~']
 
 ###### CREATE LEXER ######
-lex.lex()
+
+def rules():
+	"""
+	(name, pattern) of the rules above in the order ply tries them:
+	functions as defined, strings from the longest pattern, then the
+	literals and finally the ignored characters
+	"""
+	namespace = globals()
+	functions = sorted((x for x in namespace if x.startswith('t_') and callable(namespace[x]) and x != 't_error'),
+		key=lambda x: namespace[x].__code__.co_firstlineno)
+	strings = sorted((x for x in namespace if x.startswith('t_') and isinstance(namespace[x], str) and x != 't_ignore'),
+		key=lambda x: len(namespace[x]), reverse=True)
+	output = [ (x[2:], namespace[x].__doc__) for x in functions ]
+	output += [ (x[2:], namespace[x]) for x in strings ]
+	output += [ (x, '\\' + x) for x in literals ]
+	output.append(('ignore', '[%s]+' % t_ignore))
+	return output
+
+class _Match:
+	# (Stands for the ply token in the functions of the rules)
+	__slots__ = ('type', 'value')
+
+def illegal(code, position):
+	print("Illegal character '{}'".format(code[position]))
+
+lexer = DFALexer(rules(), skip=('COMMENT', 'ignore'), error=illegal)
+
+# (Function of every rule, if any, and the token type of the rules that are emitted as matched)
+_actions = [ globals().get('t_' + x) if callable(globals().get('t_' + x)) else None for x in lexer.names ]
+_types = [ tokens_dict.get(x) for x in lexer.names ]
+
+_ply_lexer = None
+
+def ply_lexer():
+	"""
+	The ply lexer of the same rules, built on first use. ply is only needed
+	for it
+	"""
+	global _ply_lexer
+	if _ply_lexer is None:
+		if lex is None:
+			raise ImportError('ply is not installed')
+		import sys
+		_ply_lexer = lex.lex(module=sys.modules[__name__])
+	return _ply_lexer
 
 ###### TOKENIZER ######
 
-def tokenizer(code):
-	
-	tokens = []
-	for i, line in enumerate(code.split('\n')):
-		lex.input(line)
-		while True:
-			token = lex.token()
-			if token is None:
-				break
-			tokens.append(Token(token.value, tokens_dict[token.type], i + 1, token.lexpos))
-
-	tokens.append(Token('$', CoolGrammar.EOF))
-	
-	return tokens
+def tokenize(code):
+	"""
+	Yields the tokens of `code` lazily, followed by the EOF token.
+	The DFA runs once over the whole buffer, so comments and strings
+	may span several lines; line and column are computed from the offset.
+	"""
+	actions, types, names = _actions, _types, lexer.names
+	match = _Match()
+
+	line, line_start = 1, 0
+	next_newline = code.find('\n')
+
+	for rule, start, end in lexer.scan(code):
+		# (Advance to the line that contains the token)
+		while 0 <= next_newline < start:
+			line += 1
+			line_start = next_newline + 1
+			next_newline = code.find('\n', line_start)
+
+		action = actions[rule]
+		if action is None:
+			yield Token(code[start:end], types[rule], line, start - line_start)
+			continue
+		match.type, match.value = names[rule], code[start:end]
+		if action(match) is not None:
+			yield Token(match.value, tokens_dict[match.type], line, start - line_start)
+
+	yield Token('$', CoolGrammar.EOF)
+
+def tokenize_ply(code):
+	"""
+	Same as `tokenize` with the ply lexer
+	"""
+	lexer_ = ply_lexer().clone()
+	lexer_.input(code)
+
+	line, line_start = 1, 0
+	next_newline = code.find('\n')
+
+	while True:
+		token = lexer_.token()
+		if token is None:
+			break
+
+		# (Advance to the line that contains the token)
+		while 0 <= next_newline < token.lexpos:
+			line += 1
+			line_start = next_newline + 1
+			next_newline = code.find('\n', line_start)
+
+		yield Token(token.value, tokens_dict[token.type], line, token.lexpos - line_start)
+
+	yield Token('$', CoolGrammar.EOF)
+
+def tokenize_file(path):
+	with open(path, encoding='utf8') as f:
+		code = f.read()
+	yield from tokenize(code)
 
+def tokenizer(code):
+	return list(tokenize(code))
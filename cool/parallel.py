@@ -0,0 +1,147 @@
+"""
+Type checking of the classes of a program across a pool of processes.
+
+Once the context is built the checker of a class only reads it, so the
+classes are split in contiguous chunks and every worker checks its
+chunks against its own copy of the context. The copy is sent once per
+worker: with the fork start method the workers inherit it from the parent,
+otherwise the program and the context are serialized once (see
+cool.serialize) and every worker decodes only the classes it checks.
+The errors are merged in source order, the same as the serial checker.
+
+    $ python -m cool.parallel program.cl --jobs 4
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .cmp import Scope
+from .semantic import TypeCheckerVisitor
+
+# (Declaration getter and context of the workers, set before the pool is created)
+_shared = None
+
+
+def _init_worker(data=None):
+    global _shared
+    if data is not None:
+        from .serialize import loads
+
+        typed = loads(data)
+        _shared = (typed.declaration_at, typed.context)
+
+
+def _check(indices):
+    declaration_at, context = _shared
+    checker = TypeCheckerVisitor(context)
+    root = Scope()
+    results = []
+    for i in indices:
+        declaration = declaration_at(i)
+        checker.errors = []
+        checker.visit(declaration, root.create_child(declaration))
+        results.append(checker.errors)
+    return results
+
+
+def is_cyclic(context):
+    # (The checker breaks the cycles of the context while checking, the first class of a cycle reports it)
+    for typex in context.types.values():
+        seen = set()
+        while typex is not None:
+            if typex.name in seen:
+                return True
+            seen.add(typex.name)
+            typex = typex.parent
+    return False
+
+
+def chunks(declarations, count):
+    """
+    Contiguous ranges of indexes of `declarations` with about the same
+    number of source lines each
+    """
+    lines = [ x.line for x in declarations ]
+    weights = [ max(1, b - a) for a, b in zip(lines, lines[1:]) ]
+    # (The last class is taken as long as the average)
+    weights.append(max(1, round(sum(weights) / len(weights))) if weights else 1)
+    target = sum(weights) / max(1, count)
+
+    current, weight = [], 0
+    for i, w in enumerate(weights):
+        current.append(i)
+        weight += w
+        if weight >= target:
+            yield current
+            current, weight = [], 0
+    if current:
+        yield current
+
+
+def check(program, context, jobs=None, chunks_per_job=4, start_method=None):
+    """
+    Errors of the TypeCheckerVisitor over `program` in source order, the
+    classes are checked by `jobs` processes (all the CPUs by default).
+    The scopes and the static types stay in the workers, so the inference
+    can not run on this result.
+
+    A single job, a single class or a cyclic hierarchy are checked in this
+    process, the static types are then set on `program`
+    """
+    global _shared
+    declarations = program.declarations
+    jobs = jobs or os.cpu_count() or 1
+    if jobs <= 1 or len(declarations) < 2 or is_cyclic(context):
+        errors = []
+        TypeCheckerVisitor(context, errors).visit(program)
+        return errors
+
+    method = start_method or multiprocessing.get_start_method()
+    if method == 'fork':
+        _shared = (declarations.__getitem__, context)
+        initargs = ()
+    else:
+        from .serialize import dumps
+
+        initargs = (dumps(program, context),)
+
+    ranges = list(chunks(declarations, jobs * chunks_per_job))
+    try:
+        with ProcessPoolExecutor(jobs, mp_context=multiprocessing.get_context(method), initializer=_init_worker, initargs=initargs) as pool:
+            results = list(pool.map(_check, ranges))
+    finally:
+        _shared = None
+
+    # (pool.map keeps the order of the chunks and the chunks keep the order of the classes)
+    return [ error for result in results for errors in result for error in errors ]
+
+
+def main(argv=None):
+    from .pipeline import run
+
+    argparser = argparse.ArgumentParser(prog='python -m cool.parallel', description='Type check a COOL program across several processes.')
+    argparser.add_argument('path')
+    argparser.add_argument('--jobs', '-j', type=int, default=None, help='worker processes (default: all the CPUs)')
+    argparser.add_argument('--start-method', choices=multiprocessing.get_all_start_methods(), default=None)
+    args = argparser.parse_args(argv)
+
+    with open(args.path, encoding='utf8') as f:
+        code = f.read()
+
+    start = time.perf_counter()
+    result = run(code, inference=None, jobs=args.jobs, start_method=args.start_method)
+    elapsed = time.perf_counter() - start
+
+    for error in result.errors:
+        print(error)
+    for stage in result.stages:
+        print(stage, file=sys.stderr)
+    print(f'total: {elapsed * 1000:.3f} ms', file=sys.stderr)
+    return 1 if result.errors or result.failed_stage else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import os
 from .cmp import Grammar, LR1Parser
 from .ast import *
 
@@ -135,4 +136,5 @@ def GetGrammar():
 
 CoolGrammar = GetGrammar()
 # parser
-CoolParser = LR1Parser(CoolGrammar)
\ No newline at end of file
+# the LR(1) table is cached next to this module and only rebuilt when the grammar changes
+CoolParser = LR1Parser(CoolGrammar, cache_dir=os.path.join(os.path.dirname(__file__), '__parsetab__'))
\ No newline at end of file
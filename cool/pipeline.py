@@ -0,0 +1,223 @@
+"""
+The compilation of a COOL program as a sequence of named stages:
+
+    lex -> parse -> collect -> build -> check -> infer
+
+The parse stage builds the AST while parsing, see ShiftReduceParser.evaluate.
+
+`run` returns a CompilationResult with the errors, the inferences, the
+final Context and the wall time, allocated blocks and processed items
+of every stage that ran.
+"""
+import sys
+import time
+import tracemalloc
+
+from .ast import Node
+from .cmp import ParsingError, SemanticError
+from .constraints import ConstraintInferer
+from .lexer import tokenizer
+from .parallel import check as check_parallel
+from .parser import CoolParser
+from .semantic import TypeCollectorVisitor, TypeBuilderVisitor, TypeCheckerVisitor, TypeInfererVisitor, WorklistTypeInferer
+
+STAGES = ('lex', 'parse', 'collect', 'build', 'check', 'infer')
+INFERENCE = ('worklist', 'pass', 'constraints')
+
+
+class StageStats:
+    """
+    Measures of a single stage.
+
+    seconds : wall time
+    blocks  : net memory blocks allocated by the stage
+    peak    : peak memory in bytes allocated during the stage, only when tracing memory
+    items   : tokens, AST nodes or features processed by the stage
+    """
+    def __init__(self, name, seconds, blocks, peak=None, items=0):
+        self.name = name
+        self.seconds = seconds
+        self.blocks = blocks
+        self.peak = peak
+        self.items = items
+
+    def as_dict(self):
+        return { 'stage': self.name, 'seconds': self.seconds, 'blocks': self.blocks, 'peak': self.peak, 'items': self.items }
+
+    def __str__(self):
+        peak = '' if self.peak is None else f', peak {self.peak / 1024:.1f} KiB'
+        return f'{self.name}: {self.seconds * 1000:.3f} ms, {self.items} items, {self.blocks} blocks{peak}'
+
+    def __repr__(self):
+        return str(self)
+
+
+class CompilationResult:
+    def __init__(self, code):
+        self.code = code
+        self.tokens = None
+        self.ast = None
+        self.context = None
+        self.scope = None
+        self.errors = []
+        self.inferences = []
+        self.stages = []
+        # stage that stopped the pipeline, if any
+        self.failed_stage = None
+
+    @property
+    def ok(self):
+        return self.failed_stage is None and not self.errors
+
+    def stage(self, name):
+        return next((x for x in self.stages if x.name == name), None)
+
+    def as_dict(self):
+        return {
+            'errors': self.errors,
+            'inferences': self.inferences,
+            'failed_stage': self.failed_stage,
+            'stages': [ x.as_dict() for x in self.stages ],
+        }
+
+
+def node_fields(cls):
+    # (Slots of the node class and its bases, but its position and type)
+    try:
+        return _fields[cls]
+    except KeyError:
+        fields = _fields[cls] = tuple(x for k in cls.__mro__ for x in getattr(k, '__slots__', ()) if x not in ('anchor', 'static_type'))
+        return fields
+
+_fields = {}
+
+
+def count_nodes(node):
+    # (Explicit stack, nested expressions can be arbitrarily deep)
+    count = 0
+    pending = [ node ]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, Node):
+            count += 1
+            pending.extend(getattr(value, x) for x in node_fields(value.__class__))
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+    return count
+
+
+def error_position(token, tokens):
+    """
+    Line and column to report a parsing error at `token`. The EOF token
+    has no position, an error there is reported at the last token of
+    `tokens`, or at the start when there is none
+    """
+    if token.line:
+        return token.line, token.column
+    if len(tokens) > 1:
+        return tokens[-2].line, tokens[-2].column
+    return 1, 0
+
+
+def run(code, on_stage=None, trace_memory=False, inference='worklist', jobs=1, start_method=None):
+    """
+    Compiles `code`, calling `on_stage(name, result)` after each stage.
+    The `inference` mode is one of:
+
+    worklist    : types are inferred until nothing else can be inferred,
+                  revisiting only the affected features
+    pass        : the inference pass runs once
+    constraints : the subtype constraints are collected in one pass and
+                  solved as a graph, see cool.constraints
+    None        : the infer stage does not run
+
+    With `jobs` other than 1 the classes are checked by that many processes
+    (None for all the CPUs), see cool.parallel. The scopes stay in the
+    workers, so it only works without inference
+    """
+    if inference is not None and inference not in INFERENCE:
+        raise ValueError(f'Unknown inference mode "{inference}", expected one of {", ".join(INFERENCE)}')
+    if jobs != 1 and inference is not None:
+        raise ValueError('The parallel check does not keep the scopes, use inference=None')
+
+    result = CompilationResult(code)
+    errors = result.errors
+    nodes = 0
+
+    def lex():
+        result.tokens = tokenizer(code)
+        return len(result.tokens)
+
+    def parse():
+        nonlocal nodes
+        try:
+            result.ast = CoolParser.evaluate(result.tokens)
+        except ParsingError as ex:
+            errors.append('Error on Ln %d, Col %d: ' % error_position(ex.token, result.tokens) + ex.text)
+            return None
+        nodes = count_nodes(result.ast)
+        return nodes
+
+    def collect():
+        collector = TypeCollectorVisitor(errors)
+        collector.visit(result.ast)
+        result.context = collector.context
+        return len(result.ast.declarations)
+
+    def build():
+        builder = TypeBuilderVisitor(result.context, errors)
+        builder.visit(result.ast)
+        return sum(len(x.features) for x in result.ast.declarations)
+
+    def check():
+        if jobs != 1:
+            errors.extend(check_parallel(result.ast, result.context, jobs, start_method=start_method))
+            return nodes
+        checker = TypeCheckerVisitor(result.context, errors)
+        result.scope = checker.visit(result.ast)
+        return nodes
+
+    def infer():
+        if inference == 'worklist':
+            inferer = WorklistTypeInferer(result.context, errors, result.inferences)
+            return inferer.infer(result.ast, result.scope)
+        if inference == 'constraints':
+            inferer = ConstraintInferer(result.context, errors, result.inferences)
+            return inferer.infer(result.ast, result.scope)
+        inferer = TypeInfererVisitor(result.context, errors, result.inferences)
+        inferer.visit(result.ast, result.scope)
+        return nodes
+
+    stages = zip(STAGES, (lex, parse, collect, build, check, infer) if inference else (lex, parse, collect, build, check))
+
+    # (A tracing session started by the caller is left running)
+    started = trace_memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        for name, stage in stages:
+            if trace_memory:
+                tracemalloc.reset_peak()
+                memory = tracemalloc.get_traced_memory()[0]
+            blocks = sys.getallocatedblocks()
+            start = time.perf_counter()
+            try:
+                items = stage()
+            except SemanticError as ex:
+                errors.append(ex.text)
+                items = None
+            elapsed = time.perf_counter() - start
+            blocks = sys.getallocatedblocks() - blocks
+            peak = tracemalloc.get_traced_memory()[1] - memory if trace_memory else None
+
+            result.stages.append(StageStats(name, elapsed, blocks, peak, items or 0))
+            if items is None:
+                result.failed_stage = name
+                break
+            if on_stage is not None:
+                on_stage(name, result)
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    return result
@@ -1,3 +1,5 @@
+import heapq
+
 from .cmp import visitor, Context, SelfType, AutoType, SemanticError, ErrorType, Scope
 from .ast import *
 
@@ -84,6 +86,8 @@ class TypeBuilderVisitor:
     def visit(self, node):
         for def_class in node.declarations:
             self.visit(def_class)           
+
+        self.context.hierarchy.build()
     
     @visitor.when(ClassDeclaration)
     def visit(self, node):
@@ -129,6 +133,11 @@ class TypeCheckerVisitor:
         self.string_type = self.context.get_type('String')
         self.bool_type = self.context.get_type('Bool')
         
+    def feature_name(self):
+        # (Initializers of attributes are checked out of any method)
+        return self.current_method.name if self.current_method else self.current_type.name
+
+    # children are visited by yielding their arguments, see cmp.visitor.Dispatcher
     @visitor.on('node')
     def visit(self, node, scope):
         pass
@@ -137,12 +146,13 @@ class TypeCheckerVisitor:
     def visit(self, node, scope=None):
         scope = Scope()
         for declaration in node.declarations:
-            self.visit(declaration, scope.create_child())
+            yield declaration, scope.create_child(declaration)
         return scope
 
     @visitor.when(ClassDeclaration)
     def visit(self, node, scope):
         self.current_type = self.context.get_type(node.id.lex)
+        self.current_method = None
 
         # check ciclic heritage
         parent = self.current_type.parent
@@ -158,13 +168,14 @@ class TypeCheckerVisitor:
             scope.define_variable(attr.name, attr.type)
 
         for feature in node.features:
-            self.visit(feature, scope.create_child())
+            yield feature, scope
 
     @visitor.when(AttrDeclaration)
     def visit(self, node, scope):
+        self.current_method = None
         expr = node.expression
         if expr:
-            self.visit(expr, scope.create_child())
+            yield expr, scope
             expr_type = expr.static_type
 
             attr = self.current_type.get_attribute(node.id.lex)
@@ -177,15 +188,13 @@ class TypeCheckerVisitor:
     @visitor.when(FuncDeclaration)
     def visit(self, node, scope):
         self.current_method = self.current_type.get_method(node.id.lex)
+        scope = scope.create_child(node)
 
         # check ilegal redefined func
         parent = self.current_type.parent
         if parent:
-            try:
-                parent_method = parent.get_method(node.id.lex)
-            except SemanticError:
-                pass
-            else:
+            parent_method = parent.lookup_method(node.id.lex)
+            if parent_method:
                 if parent_method.param_types != self.current_method.param_types or parent_method.return_type != self.current_method.return_type:
                      self.errors.append('Error on Ln %d, Col %d: ' % (node.line, node.column) + 'Method "%s" of "%s" already defined in "%s" with a different signature.' % (self.current_method.name, self.current_type.name, parent.name))
         
@@ -195,7 +204,7 @@ class TypeCheckerVisitor:
             scope.define_variable(pname, ptype)
             
         body = node.body
-        self.visit(body, scope.create_child())
+        yield body, scope
             
         body_type = body.static_type
         return_type = self.current_type if isinstance(self.current_method.return_type, SelfType) else self.current_method.return_type
@@ -206,14 +215,14 @@ class TypeCheckerVisitor:
     @visitor.when(IfThenElse)
     def visit(self, node, scope):
         condition = node.condition
-        self.visit(condition, scope.create_child())
+        yield condition, scope
 
         condition_type = condition.static_type
         if not condition_type.conforms_to(self.bool_type):
             self.errors.append('Error on Ln %d, Col %d: ' % (condition.line, condition.column) + 'Cannot convert "%s" into "%s".' % (condition_type.name, self.bool_type.name))
 
-        self.visit(node.if_body, scope.create_child())
-        self.visit(node.else_body, scope.create_child())
+        yield node.if_body, scope
+        yield node.else_body, scope
 
         if_type = node.if_body.static_type
         else_type = node.else_body.static_type
@@ -222,25 +231,26 @@ class TypeCheckerVisitor:
     @visitor.when(WhileLoop)
     def visit(self, node, scope):
         condition = node.condition
-        self.visit(condition, scope.create_child())
+        yield condition, scope
 
         condition_type = condition.static_type
         if not condition_type.conforms_to(self.bool_type):
             self.errors.append('Error on Ln %d, Col %d: ' % (condition.line, condition.column) + 'Cannot convert "%s" into "%s".' % (condition_type.name, self.bool_type.name))
 
-        self.visit(node.body, scope.create_child())
+        yield node.body, scope
 
         node.static_type = self.object_type
 
     @visitor.when(Block)
     def visit(self, node, scope):
         for expr in node.expressions:
-            self.visit(expr, scope.create_child())
+            yield expr, scope
 
         node.static_type = node.expressions[-1].static_type
 
     @visitor.when(LetIn)
     def visit(self, node, scope):
+        scope = scope.create_child(node)
         for idx, typex, expr in node.let_body:
             try:
                 node_type = self.context.get_type(typex.lex)
@@ -249,23 +259,23 @@ class TypeCheckerVisitor:
                 node_type = ErrorType()
             
             id_type = self.current_type if isinstance(node_type, SelfType) else node_type
-            child = scope.create_child()
 
             if expr:
-                self.visit(expr, child)
+                # (Only the previous variables of the let are visible from the expression)
+                yield expr, scope.create_child(idx)
                 expr_type = expr.static_type
                 if not expr_type.conforms_to(id_type):
                     self.errors.append('Error on Ln %d, Col %d: ' % (expr.line, expr.column) + 'Cannot convert "%s" into "%s".' % (expr_type.name, id_type.name))
 
             scope.define_variable(idx.lex, id_type)
 
-        self.visit(node.in_body, scope.create_child())
+        yield node.in_body, scope
 
         node.static_type = node.in_body.static_type
 
     @visitor.when(CaseOf)
     def visit(self, node, scope):
-        self.visit(node.expression, scope.create_child())
+        yield node.expression, scope
 
         node.static_type = None
 
@@ -282,9 +292,9 @@ class TypeCheckerVisitor:
 
             id_type = node_type
 
-            child_scope = scope.create_child()
+            child_scope = scope.create_child(idx)
             child_scope.define_variable(idx.lex, id_type)
-            self.visit(expr, child_scope)
+            yield expr, child_scope
             expr_type = expr.static_type
 
             node.static_type = node.static_type.type_union(expr_type) if node.static_type else expr_type
@@ -292,7 +302,7 @@ class TypeCheckerVisitor:
     @visitor.when(Assign)
     def visit(self, node, scope):
         expression = node.expression
-        self.visit(expression, scope.create_child())
+        yield expression, scope
         expr_type = expression.static_type
         
         if scope.is_defined(node.id.lex):
@@ -304,14 +314,14 @@ class TypeCheckerVisitor:
             elif not expr_type.conforms_to(node_type):
                 self.errors.append('Error on Ln %d, Col %d: ' % (expression.line, expression.column) + 'Cannot convert "%s" into "%s".' % (expr_type.name, node_type.name))
         else:
-            self.errors.append('Error on Ln %d, Col %d: ' % (node.line, node.column) + 'Variable "%s" is not defined in "%s".' % (node.id.lex, self.current_method.name))
+            self.errors.append('Error on Ln %d, Col %d: ' % (node.line, node.column) + 'Variable "%s" is not defined in "%s".' % (node.id.lex, self.feature_name()))
         
         node.static_type = expr_type
 
     @visitor.when(Not)
     def visit(self, node, scope):
         expression = node.expression
-        self.visit(expression, scope.create_child())
+        yield expression, scope
 
         expr_type = expression.static_type
         if not expr_type.conforms_to(self.bool_type):
@@ -321,10 +331,10 @@ class TypeCheckerVisitor:
 
     @visitor.when(LessEqual)
     def visit(self, node, scope):
-        self.visit(node.left, scope.create_child())
+        yield node.left, scope
         left_type = node.left.static_type
 
-        self.visit(node.right, scope.create_child())
+        yield node.right, scope
         right_type = node.right.static_type
 
         if not left_type.conforms_to(self.int_type) or not right_type.conforms_to(self.int_type):
@@ -334,10 +344,10 @@ class TypeCheckerVisitor:
 
     @visitor.when(Less)
     def visit(self, node, scope):
-        self.visit(node.left, scope.create_child())
+        yield node.left, scope
         left_type = node.left.static_type
 
-        self.visit(node.right, scope.create_child())
+        yield node.right, scope
         right_type = node.right.static_type
         
         if not left_type.conforms_to(self.int_type) or not right_type.conforms_to(self.int_type):
@@ -347,10 +357,10 @@ class TypeCheckerVisitor:
 
     @visitor.when(Equal)
     def visit(self, node, scope):
-        self.visit(node.left, scope.create_child())
+        yield node.left, scope
         left_type = node.left.static_type
 
-        self.visit(node.right, scope.create_child())
+        yield node.right, scope
         right_type = node.right.static_type
 
         if isinstance(left_type, AutoType) or isinstance(right_type, AutoType):
@@ -366,10 +376,10 @@ class TypeCheckerVisitor:
     
     @visitor.when(Arithmetic)
     def visit(self, node, scope):
-        self.visit(node.left, scope.create_child())
+        yield node.left, scope
         left_type = node.left.static_type
         
-        self.visit(node.right, scope.create_child())
+        yield node.right, scope
         right_type = node.right.static_type
         
         if not left_type.conforms_to(self.int_type) or not right_type.conforms_to(self.int_type):
@@ -379,14 +389,14 @@ class TypeCheckerVisitor:
 
     @visitor.when(IsVoid)
     def visit(self, node, scope):
-        self.visit(node.expression, scope.create_child())
+        yield node.expression, scope
 
         node.static_type = self.bool_type
 
     @visitor.when(Complement)
     def visit(self, node, scope):
         expression = node.expression
-        self.visit(expression, scope.create_child())
+        yield expression, scope
 
         expr_type = expression.static_type
         if not expr_type.conforms_to(self.int_type):
@@ -396,7 +406,7 @@ class TypeCheckerVisitor:
 
     @visitor.when(FunctionCall)
     def visit(self, node, scope):
-        self.visit(node.obj, scope.create_child())
+        yield node.obj, scope
         obj_type = node.obj.static_type
         
         try:
@@ -425,7 +435,7 @@ class TypeCheckerVisitor:
             obj_method = None
 
         for arg in node.args:
-            self.visit(arg, scope.create_child())
+            yield arg, scope
 
         if obj_method and len(node.args) == len(obj_method.param_types):
             for arg, param_type in zip(node.args, obj_method.param_types):
@@ -452,7 +462,7 @@ class TypeCheckerVisitor:
             obj_method = None
 
         for arg in node.args:
-            self.visit(arg, scope.create_child())
+            yield arg, scope
 
         if obj_method and len(node.args) == len(obj_method.param_types):
             for arg, param_type in zip(node.args, obj_method.param_types):
@@ -489,7 +499,7 @@ class TypeCheckerVisitor:
             var = scope.find_variable(node.token.lex)
             node_type = var.type       
         else:
-            self.errors.append('Error on Ln %d, Col %d: ' % (node.line, node.column) + 'Variable "%s" is not defined in "%s".' % (node.token.lex, self.current_method.name))
+            self.errors.append('Error on Ln %d, Col %d: ' % (node.line, node.column) + 'Variable "%s" is not defined in "%s".' % (node.token.lex, self.feature_name()))
             node_type = ErrorType()
         
         node.static_type = node_type
@@ -514,6 +524,7 @@ class TypeInfererVisitor:
         self.string_type = self.context.get_type('String')
         self.bool_type = self.context.get_type('Bool')
         
+    # children are visited by yielding their arguments, see cmp.visitor.Dispatcher
     @visitor.on('node')
     def visit(self, node, scope):
         pass
@@ -522,8 +533,8 @@ class TypeInfererVisitor:
     def visit(self, node, scope):
         self.changed = False
 
-        for declaration, child_scope in zip(node.declarations, scope.children):
-            self.visit(declaration, child_scope)
+        for declaration in node.declarations:
+            yield declaration, scope.scope_of(declaration)
 
         return self.changed
 
@@ -531,41 +542,55 @@ class TypeInfererVisitor:
     def visit(self, node, scope):
         self.current_type = self.context.get_type(node.id.lex)
 
-        for feature, child_scope in zip(node.features, scope.children):
-            self.visit(feature, child_scope)
+        for feature in node.features:
+            yield feature, scope
+
+        self.infer_attributes(scope)
 
+    def infer_attributes(self, scope):
         for attr, var in zip(self.current_type.attributes, scope.locals):
             if var.infer_type():
-                self.changed = True
+                self.infered(var)
                 attr.type = var.type
                 self.infrencias.append('On class "%s", attribute "%s": type "%s"' % (self.current_type.name, attr.name, var.type.name))
 
+    # Hooks for the inference drivers: `used` is called with every variable
+    # read while visiting and `infered` with every variable that gets a type
+    def used(self, var):
+        pass
+
+    def infered(self, var):
+        self.changed = True
+
     @visitor.when(AttrDeclaration)
     def visit(self, node, scope):
         expression = node.expression
         if expression:
             attr = self.current_type.get_attribute(node.id.lex)
+            var = scope.find_variable(node.id.lex)
+            self.used(var)
 
-            self.visit(expression, scope.children[0], attr.type)
+            yield expression, scope, attr.type
             expr_type = expression.static_type
 
-            var = scope.find_variable(node.id.lex)
             var.set_upper_type(expr_type)
             if var.infer_type():
-                self.changed = True
+                self.infered(var)
                 attr.type = var.type
                 self.infrencias.append('On class "%s", attribute "%s": type "%s"' % (self.current_type.name, attr.name, var.type.name))
 
     @visitor.when(FuncDeclaration)
     def visit(self, node, scope):
         self.current_method = self.current_type.get_method(node.id.lex)
+        scope = scope.scope_of(node)
             
         return_type = self.current_method.return_type
-        self.visit(node.body, scope.children[0], self.current_type if isinstance(return_type, SelfType) else return_type)
+        self.used(self.current_method.return_info)
+        yield node.body, scope, self.current_type if isinstance(return_type, SelfType) else return_type
 
         for i, var in enumerate(scope.locals[1:]):
             if var.infer_type():
-                self.changed = True
+                self.infered(var)
                 self.current_method.param_types[i] = var.type
                 self.infrencias.append('On method "%s" of class "%s", param "%s": type "%s"' % (self.current_method.name, self.current_type.name, var.name, var.type.name))
                
@@ -573,17 +598,17 @@ class TypeInfererVisitor:
         var = self.current_method.return_info
         var.set_lower_type(body_type)
         if var.infer_type():
-            self.changed = True
+            self.infered(var)
             self.current_method.return_type = var.type
             self.infrencias.append('Return of method "%s" in class "%s", type "%s"' % (self.current_method.name, self.current_type.name, var.type.name))
 
     @visitor.when(IfThenElse)
     def visit(self, node, scope, expected_type=None):
         # posible inferencia
-        self.visit(node.condition, scope.children[0], self.bool_type)
+        yield node.condition, scope, self.bool_type
 
-        self.visit(node.if_body, scope.children[1])
-        self.visit(node.else_body, scope.children[2])
+        yield node.if_body, scope
+        yield node.else_body, scope
 
         if_type = node.if_body.static_type
         else_type = node.else_body.static_type
@@ -592,39 +617,40 @@ class TypeInfererVisitor:
     @visitor.when(WhileLoop)
     def visit(self, node, scope, expected_type=None):
         # posible inferencia
-        self.visit(node.condition, scope.children[0], self.bool_type)
+        yield node.condition, scope, self.bool_type
 
-        self.visit(node.body, scope.children[1])
+        yield node.body, scope
 
         node.static_type = self.object_type
 
     @visitor.when(Block)
     def visit(self, node, scope, expected_type=None):
-        for expr, child_scope in zip(node.expressions[:-1], scope.children[:-1]):
-            self.visit(expr, child_scope)
+        for expr in node.expressions[:-1]:
+            yield expr, scope
         # posible inferencia
-        self.visit(node.expressions[-1], scope.children[-1], expected_type)
+        yield node.expressions[-1], scope, expected_type
 
         node.static_type = node.expressions[-1].static_type
             
     @visitor.when(LetIn)
     def visit(self, node, scope, expected_type=None):
-        for (idx, typex, expr), child_scope, (i, var) in zip(node.let_body, scope.children[:-1], enumerate(scope.locals)):
+        scope = scope.scope_of(node)
+        for (idx, typex, expr), var in zip(node.let_body, scope.locals):
             if expr:
-                self.visit(expr, child_scope, var.type if var.infered else None)
+                yield expr, scope.scope_of(idx), var.type if var.infered else None
                 expr_type = expr.static_type
                 
                 var.set_upper_type(expr_type)
                 if var.infer_type():
-                    self.changed = True
+                    self.infered(var)
                     typex.name = var.type.name
                     self.infrencias.append('Error on Ln %d, Col %d: ' % (idx.line, idx.column) + 'Varible "%s", type "%s"' % (var.name, var.type.name))
 
-        self.visit(node.in_body, scope.children[-1], expected_type)
+        yield node.in_body, scope, expected_type
 
         for i, var in enumerate(scope.locals):
             if var.infer_type():
-                    self.changed = True
+                    self.infered(var)
                     idx, typex, _ = node.let_body[i]
                     typex.name = var.type.name
                     self.infrencias.append('Error on Ln %d, Col %d: ' % (idx.line, idx.column) + 'Varible "%s", type "%s"' % (var.name, var.type.name))
@@ -633,12 +659,12 @@ class TypeInfererVisitor:
 
     @visitor.when(CaseOf)
     def visit(self, node, scope, expected_type=None):
-        self.visit(node.expression, scope.children[0])
+        yield node.expression, scope
 
         node.static_type = None
 
-        for (idx, typex, expr), child_scope in zip(node.branches, scope.children[1:]):
-            self.visit(expr, child_scope)
+        for idx, typex, expr in node.branches:
+            yield expr, scope.scope_of(idx)
             expr_type = expr.static_type
 
             node.static_type = node.static_type.type_union(expr_type) if node.static_type else expr_type
@@ -646,71 +672,74 @@ class TypeInfererVisitor:
     @visitor.when(Assign)
     def visit(self, node, scope, expected_type=None):
         var = scope.find_variable(node.id.lex) if scope.is_defined(node.id.lex) else None
+        if var:
+            self.used(var)
 
-        self.visit(node.expression, scope.children[0], var.type if var and var.infered else expected_type)
+        yield node.expression, scope, var.type if var and var.infered else expected_type
         expr_type = node.expression.static_type
 
-        var.set_lower_type(expr_type)
+        if var:
+            var.set_lower_type(expr_type)
         
         node.static_type = expr_type
 
     @visitor.when(Not)
     def visit(self, node, scope, expected_type=None):
         # posible inferencia
-        self.visit(node.expression, scope.children[0], self.bool_type)
+        yield node.expression, scope, self.bool_type
 
         node.static_type = self.bool_type
 
     @visitor.when(LessEqual)
     def visit(self, node, scope, expected_type=None):
         # posible inferencia
-        self.visit(node.left, scope.children[0], self.int_type)
+        yield node.left, scope, self.int_type
 
         # posible inferencia
-        self.visit(node.right, scope.children[1], self.int_type)
+        yield node.right, scope, self.int_type
 
         node.static_type = self.bool_type
 
     @visitor.when(Less)
     def visit(self, node, scope, expected_type=None):
         # posible inferencia
-        self.visit(node.left, scope.children[0], self.int_type)
+        yield node.left, scope, self.int_type
 
         # posible inferencia
-        self.visit(node.right, scope.children[1], self.int_type)
+        yield node.right, scope, self.int_type
 
         node.static_type = self.bool_type
 
     @visitor.when(Equal)
     def visit(self, node, scope, expected_type=None):
         # posible inferencia
-        self.visit(node.left, scope.children[0], node.right.static_type)
+        yield node.left, scope, node.right.static_type
 
         # posible inferencia
-        self.visit(node.right, scope.children[1], node.left.static_type)
+        yield node.right, scope, node.left.static_type
 
         node.static_type = self.bool_type
 
     @visitor.when(Arithmetic)
     def visit(self, node, scope, expected_type=None):
         # posible inferencia
-        self.visit(node.left, scope.children[0], self.int_type)
+        yield node.left, scope, self.int_type
 
         # posible inferencia
-        self.visit(node.right, scope.children[1], self.int_type)
+        yield node.right, scope, self.int_type
 
         node.static_type = self.int_type
 
     @visitor.when(IsVoid)
     def visit(self, node, scope, expected_type=None):
-        self.visit(node.expression, scope.children[0])
+        yield node.expression, scope
 
         node.static_type = self.bool_type
 
     @visitor.when(Complement)
     def visit(self, node, scope, expected_type=None):
         # posible inferencia
-        self.visit(node.expression, scope.children[0], self.int_type)
+        yield node.expression, scope, self.int_type
 
         node.static_type = self.int_type
 
@@ -726,27 +755,27 @@ class TypeInfererVisitor:
                     if isinstance(node_type, SelfType) or isinstance(node_type, AutoType):
                         node_type = ErrorType()
 
-        self.visit(node.obj, scope.children[0], node_type)
+        yield node.obj, scope, node_type
         obj_type = node.obj.static_type
         
-        try:
-            obj_type = node_type if node_type else obj_type
-            
-            obj_method = obj_type.get_method(node.id.lex)       
+        obj_type = node_type if node_type else obj_type
+        
+        obj_method = obj_type.lookup_method(node.id.lex)
+        if obj_method:
+            self.used(obj_method.return_info)
             
             # coloca el expected_type al retorno
             node_type = obj_type if isinstance(obj_method.return_type, SelfType) else obj_method.return_type
-        except SemanticError:
+        else:
             node_type = ErrorType()
-            obj_method = None
             
         if obj_method and len(node.args) == len(obj_method.param_types):
-            for arg, var, child_scope in zip(node.args, obj_method.param_infos, scope.children[1:]):
-                self.visit(arg, child_scope, var.type if var.infered else None)
+            for arg, var in zip(node.args, obj_method.param_infos):
+                yield arg, scope, var.type if var.infered else None
                 # inferir var.type por arg_type
         else:
-            for arg, child_scope in zip(node.args, scope.children[1:]):
-                self.visit(arg, child_scope)
+            for arg in node.args:
+                yield arg, scope
         
         node.static_type = node_type
 
@@ -754,22 +783,22 @@ class TypeInfererVisitor:
     def visit(self, node, scope, expected_type=None):
         obj_type = self.current_type
         
-        try:
-            obj_method = obj_type.get_method(node.id.lex)
+        obj_method = obj_type.lookup_method(node.id.lex)
+        if obj_method:
+            self.used(obj_method.return_info)
             
             # coloca el expected_type al retorno
             node_type = obj_type if isinstance(obj_method.return_type, SelfType) else obj_method.return_type
-        except SemanticError:
+        else:
             node_type = ErrorType()
-            obj_method = None
 
         if obj_method and len(node.args) == len(obj_method.param_types):
-            for arg, var, child_scope in zip(node.args, obj_method.param_infos, scope.children):
-                self.visit(arg, child_scope, var.type if var.infered else None)
+            for arg, var in zip(node.args, obj_method.param_infos):
+                yield arg, scope, var.type if var.infered else None
                 # inferir var.type por arg_type
         else:
-            for arg, child_scope in zip(node.args, scope.children):
-                self.visit(arg, child_scope)
+            for arg in node.args:
+                yield arg, scope
             
             
         node.static_type = node_type
@@ -795,6 +824,7 @@ class TypeInfererVisitor:
     def visit(self, node, scope, expected_type=None):
         if scope.is_defined(node.token.lex):
             var = scope.find_variable(node.token.lex)
+            self.used(var)
 
             if expected_type:
                 var.set_upper_type(expected_type)
@@ -810,6 +840,118 @@ class TypeInfererVisitor:
         node.static_type = self.bool_type
 
 
+#Inferencia hasta el punto fijo sin recorrer todo el ast en cada ronda
+#Cada feature (atributo o metodo) registra las variables que lee, y cuando una
+#variable recibe un tipo solo se vuelven a visitar las features que la leen
+class WorklistTypeInferer(TypeInfererVisitor):
+    """
+    Reaches the same fixed point as repeating TypeInfererVisitor over the
+    whole program, revisiting only the features that read a variable
+    whose type was just inferred (and the feature that inferred it).
+    """
+    def __init__(self, context, errors=[], infrencias=[]):
+        TypeInfererVisitor.__init__(self, context, errors, infrencias)
+        # VariableInfo -> features that read it, as (class index, feature index)
+        self.readers = {}
+        self.current_feature = None
+        self.dirty = set()
+        self.visits = 0
+
+    def used(self, var):
+        try:
+            self.readers[var].add(self.current_feature)
+        except KeyError:
+            self.readers[var] = { self.current_feature }
+
+    def infered(self, var):
+        self.changed = True
+        self.dirty.update(self.readers.get(var, ()))
+        if self.current_feature is not None:
+            self.dirty.add(self.current_feature)
+
+    def _attribute_readers(self, scope, features, i):
+        # Attributes are infered once all the features of the class added their
+        # constraints, so every feature reading a pending attribute is revisited
+        pending = [ var for var in scope.locals if not var.infered ]
+        changed = True
+        while changed:
+            changed = False
+            for var in pending:
+                readers = { j for k, j in self.readers.get(var, ()) if k == i }
+                if readers & features and not readers <= features:
+                    features |= readers
+                    changed = True
+        return features
+
+    def _schedule(self, i, pending, queued, following):
+        # (Features of later classes are still visited in this round)
+        for key in self.dirty:
+            if key[0] > i:
+                if key not in queued:
+                    heapq.heappush(pending, key)
+                    queued.add(key)
+            else:
+                following.add(key)
+        self.dirty.clear()
+
+    def infer(self, node, scope):
+        """
+        Infers the types of `node` (the Program) with the scope built by the
+        TypeCheckerVisitor. Returns the number of features visited
+        """
+        self.changed = False
+        classes = [ (declaration, scope.scope_of(declaration)) for declaration in node.declarations ]
+        pending = [ (i, j) for i, (declaration, _) in enumerate(classes) for j in range(len(declaration.features)) ]
+        queued = set(pending)
+
+        while pending:
+            # (A round visits the pending features in source order)
+            heapq.heapify(pending)
+            following = set()
+
+            while pending:
+                i = pending[0][0]
+                features = set()
+                while pending and pending[0][0] == i:
+                    key = heapq.heappop(pending)
+                    queued.discard(key)
+                    features.add(key[1])
+
+                declaration, class_scope = classes[i]
+                features = sorted(self._attribute_readers(class_scope, features, i))
+                visited = set()
+
+                self.current_type = self.context.get_type(declaration.id.lex)
+                while features:
+                    j = heapq.heappop(features)
+                    if j in visited:
+                        continue
+                    visited.add(j)
+
+                    self.current_feature = (i, j)
+                    self.visit(declaration.features[j], class_scope)
+                    self.visits += 1
+
+                    # (Later features of the class are still visited in this round, as
+                    #  long as the readers of its pending attributes can be visited too)
+                    later = { k for c, k in self.dirty if c == i and k > j }
+                    if later:
+                        readers = self._attribute_readers(class_scope, set(later), i)
+                        if all(k > j or k in visited for k in readers):
+                            for k in readers - visited:
+                                heapq.heappush(features, k)
+                            self.dirty -= { (i, k) for k in later }
+                    self._schedule(i, pending, queued, following)
+
+                self.current_feature = None
+                self.infer_attributes(class_scope)
+                self._schedule(i, pending, queued, following)
+
+            pending = list(following)
+            queued = set(following)
+
+        return self.visits
+
 
 def ChecksSemantics(node):
     errors = []
@@ -824,8 +966,8 @@ def ChecksSemantics(node):
     scope = checker.visit(node)
 
     infrencias = []
-    inferer = TypeInfererVisitor(context, errors, infrencias)
-    while inferer.visit(node, scope): pass
+    inferer = WorklistTypeInferer(context, errors, infrencias)
+    inferer.infer(node, scope)
 
     return context,errors,scope,infrencias
 
@@ -0,0 +1,550 @@
+"""
+Serialization of a compiled program: the AST annotated with `static_type`,
+the Context and the errors and inferences, so other tools can read the
+results without running the lexer, the parser and the semantic passes.
+
+    data = dumps(result.ast, result.context, result.errors, result.inferences)
+    typed = loads(data)
+    typed.context.get_type('Main')
+    typed.declaration('Main').features[0].body.static_type
+
+Every class declaration is stored as a post-order stream of operations
+(a token, a reference to a token already read, None, a list, a tuple or a
+node built from the values before it), decoded with a value stack, so
+the depth of the AST is not bound by the recursion limit. The classes
+are decoded lazily, one at a time, when asked for.
+
+The binary format (`dumps`) is the magic `COOLTAST`, the format version
+and the flags as two little endian uint16, and a payload (zlib compressed
+with the COMPRESSED flag) of uint32 words:
+
+    strings     : count, the length of each one, then the UTF-8 text as
+                  words holding its byte length and the padded bytes
+    errors      : count, string ids
+    inferences  : count, string ids
+    context     : count, then every type as kind, name, sealed, parent,
+                  attributes (count, name and type each) and methods
+                  (count, name, return type, param count, name and type of
+                  every param)
+    classes     : count, then name, offset and length of every stream
+    streams     : the operations of every class
+
+Types are referenced as 0 for None, 1 for SELF_TYPE, 2 for AUTO_TYPE, 3
+for the error type and 4 + i for the i-th type of the context.
+
+The JSON format (`dumps_json`) holds the same data, with operations as
+lists and types by name, and is meant for debugging.
+"""
+import json
+import sys
+import zlib
+from array import array
+
+from . import ast
+from .cmp import Context, Type, Attribute, Method, SelfType, AutoType, ErrorType
+from .cmp.utils import Token
+from .parser import CoolGrammar
+from .pipeline import node_fields
+
+MAGIC = b'COOLTAST'
+FORMAT_VERSION = 1
+
+# (Flags of the header)
+COMPRESSED = 1
+
+# (Operations of the class streams)
+NONE, TOKEN, REFERENCE, LIST, TUPLE, NODE = range(6)
+OPERATIONS = ('none', 'token', 'ref', 'list', 'tuple', 'node')
+
+# (Kinds of the lexemes, the lexer converts integers and booleans)
+TEXT, INTEGER, BOOLEAN = range(3)
+
+# (Kinds of the context types)
+PLAIN, SELF, AUTO, ERROR = range(4)
+SPECIAL = { SELF: SelfType, AUTO: AutoType, ERROR: ErrorType }
+
+NODE_CLASSES = tuple(x for x in vars(ast).values() if isinstance(x, type) and issubclass(x, ast.Node))
+NODE_IDS = { x: i for i, x in enumerate(NODE_CLASSES) }
+NODE_NAMES = { x.__name__: x for x in NODE_CLASSES }
+
+
+def _kind(typex):
+    if isinstance(typex, SelfType):
+        return SELF
+    if isinstance(typex, AutoType):
+        return AUTO
+    if isinstance(typex, ErrorType):
+        return ERROR
+    return PLAIN
+
+
+class _Writer:
+    """
+    Flattens a program into the operations of every class. Strings and
+    types are kept as Python values, the formats encode them
+    """
+    def __init__(self, context):
+        self.context = context
+        self.types = { id(x): i for i, x in enumerate(context.types.values()) }
+
+    def type_ref(self, typex):
+        if typex is None:
+            return None
+        if id(typex) not in self.types and _kind(typex) == PLAIN:
+            raise ValueError(f'Type "{typex.name}" is not in the context')
+        return typex
+
+    def operations(self, declaration):
+        tokens = {}
+        output = []
+        # (Values to write, a node is pushed again as a marker after its fields)
+        pending = [ declaration ]
+        while pending:
+            value = pending.pop()
+            if value is None:
+                output.append((NONE,))
+            elif isinstance(value, Token):
+                index = tokens.get(id(value))
+                if index is None:
+                    tokens[id(value)] = len(tokens)
+                    output.append((TOKEN, value.lex, str(value.token_type), value.line, value.column))
+                else:
+                    output.append((REFERENCE, index))
+            elif isinstance(value, ast.Node):
+                fields = node_fields(value.__class__)
+                pending.append(_Built(value))
+                pending.extend(getattr(value, x) for x in reversed(fields))
+            elif isinstance(value, _Built):
+                node = value.node
+                # (Expressions out of the checked classes have no type)
+                static_type = self.type_ref(getattr(node, 'static_type', None)) if isinstance(node, ast.Expression) else None
+                output.append((NODE, node.__class__, static_type, tokens[id(node.anchor)]))
+            elif isinstance(value, list):
+                pending.append(_Sequence(LIST, len(value)))
+                pending.extend(reversed(value))
+            elif isinstance(value, tuple):
+                pending.append(_Sequence(TUPLE, len(value)))
+                pending.extend(reversed(value))
+            elif isinstance(value, _Sequence):
+                output.append((value.operation, value.length))
+            else:
+                raise ValueError(f'Cannot serialize {type(value).__name__} values')
+        return output
+
+
+class _Built:
+    __slots__ = ('node',)
+
+    def __init__(self, node):
+        self.node = node
+
+
+class _Sequence:
+    __slots__ = ('operation', 'length')
+
+    def __init__(self, operation, length):
+        self.operation = operation
+        self.length = length
+
+
+def _build(operations, resolve_type):
+    """
+    Builds the class declaration from its operations
+    """
+    symbols = CoolGrammar.symbDict
+    tokens = []
+    stack = []
+    for operation in operations:
+        code = operation[0]
+        if code == TOKEN:
+            _, lex, token_type, line, column = operation
+            token = Token(lex, symbols.get(token_type, token_type), line, column)
+            tokens.append(token)
+            stack.append(token)
+        elif code == REFERENCE:
+            stack.append(tokens[operation[1]])
+        elif code == NONE:
+            stack.append(None)
+        elif code == LIST or code == TUPLE:
+            length = operation[1]
+            values = stack[len(stack) - length:]
+            del stack[len(stack) - length:]
+            stack.append(values if code == LIST else tuple(values))
+        elif code == NODE:
+            _, cls, static_type, anchor = operation
+            node = cls.__new__(cls)
+            fields = node_fields(cls)
+            values = stack[len(stack) - len(fields):]
+            del stack[len(stack) - len(fields):]
+            for name, value in zip(fields, values):
+                setattr(node, name, value)
+            node.anchor = tokens[anchor]
+            if isinstance(node, ast.Expression):
+                node.static_type = resolve_type(static_type)
+            stack.append(node)
+        else:
+            raise ValueError(f'Invalid operation {code}')
+
+    if len(stack) != 1 or not isinstance(stack[0], ast.ClassDeclaration):
+        raise ValueError('The stream does not hold a class declaration')
+    return stack[0]
+
+
+class TypedProgram:
+    """
+    A deserialized compilation. The context, errors and inferences are
+    read at once; every class declaration is decoded when first asked for
+    by `declaration`, `declarations` or `program`
+    """
+    def __init__(self, context, errors, inferences, streams, resolve_type):
+        self.context = context
+        self.errors = errors
+        self.inferences = inferences
+        # (name, function returning its operations) of every class, in source order
+        self.streams = streams
+        self.resolve_type = resolve_type
+        self.decoded = {}
+        # a redefined class is found by the name of its first declaration
+        self.indexes = {}
+        for i, (name, _) in enumerate(streams):
+            self.indexes.setdefault(name, i)
+
+    @property
+    def class_names(self):
+        return [ name for name, _ in self.streams ]
+
+    def declaration(self, name):
+        try:
+            index = self.indexes[name]
+        except KeyError:
+            raise KeyError(f'There is no class "{name}" in the program') from None
+        return self.declaration_at(index)
+
+    def declaration_at(self, index):
+        try:
+            return self.decoded[index]
+        except KeyError:
+            declaration = self.decoded[index] = _build(self.streams[index][1](), self.resolve_type)
+            return declaration
+
+    def declarations(self):
+        return [ self.declaration_at(i) for i in range(len(self.streams)) ]
+
+    @property
+    def program(self):
+        declarations = self.declarations()
+        return ast.Program(declarations) if declarations else None
+
+
+def _context_types(context):
+    return [ (_kind(x), x) for x in context.types.values() ]
+
+
+def _rebuild_context(types):
+    """
+    Context from (kind, name, sealed, parent, attributes, methods) entries
+    where every type is already resolved by `resolve_type`
+    """
+    context = Context()
+    created = []
+    for kind, name, sealed in types:
+        typex = Type(name) if kind == PLAIN else SPECIAL[kind]()
+        context.add_type(typex)
+        typex.sealed = sealed
+        created.append(typex)
+    return context, created
+
+
+def _fill_context(created, members, resolve_type):
+    for typex, (parent, attributes, methods) in zip(created, members):
+        typex.parent = resolve_type(parent)
+        typex.attributes = [ Attribute(name, resolve_type(t)) for name, t in attributes ]
+        for name, return_type, params in methods:
+            typex.methods[name] = Method(name, [ x for x, _ in params ], [ resolve_type(t) for _, t in params ], resolve_type(return_type))
+        typex.members_changed()
+    if created:
+        created[0].hierarchy.build()
+
+
+# Binary format
+
+class _Strings:
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def __call__(self, value):
+        try:
+            return self.ids[value]
+        except KeyError:
+            index = self.ids[value] = len(self.values)
+            self.values.append(value)
+            return index
+
+
+def dumps(program, context, errors=(), inferences=(), compress=False):
+    """
+    Binary encoding of the typed `program` and its `context`
+    """
+    writer = _Writer(context)
+    strings = _Strings()
+    types = { id(x): i + 4 for i, x in enumerate(context.types.values()) }
+
+    def type_ref(typex):
+        if typex is None:
+            return 0
+        try:
+            return types[id(typex)]
+        except KeyError:
+            return _kind(typex)
+
+    head = array('I')
+    head.append(len(errors))
+    head.extend(strings(x) for x in errors)
+    head.append(len(inferences))
+    head.extend(strings(x) for x in inferences)
+
+    head.append(len(context.types))
+    for kind, typex in _context_types(context):
+        head.extend((kind, strings(typex.name), int(bool(typex.sealed)), type_ref(typex.parent)))
+        head.append(len(typex.attributes))
+        for attr in typex.attributes:
+            head.extend((strings(attr.name), type_ref(attr.type)))
+        head.append(len(typex.methods))
+        for method in typex.methods.values():
+            head.extend((strings(method.name), type_ref(method.return_type), len(method.param_names)))
+            for pname, ptype in zip(method.param_names, method.param_types):
+                head.extend((strings(pname), type_ref(ptype)))
+
+    declarations = program.declarations if program is not None else []
+    body = array('I')
+    index = []
+    for declaration in declarations:
+        start = len(body)
+        for operation in writer.operations(declaration):
+            code = operation[0]
+            if code == TOKEN:
+                _, lex, token_type, line, column = operation
+                kind = BOOLEAN if isinstance(lex, bool) else INTEGER if isinstance(lex, int) else TEXT
+                body.extend((TOKEN, kind, strings(str(lex)), strings(token_type), line, column))
+            elif code == NODE:
+                _, cls, static_type, anchor = operation
+                body.extend((NODE, NODE_IDS[cls], type_ref(static_type), anchor))
+            elif code == NONE:
+                body.append(NONE)
+            else:
+                body.extend(operation)
+        index.append((strings(declaration.id.lex), start, len(body) - start))
+
+    head.append(len(index))
+    for entry in index:
+        head.extend(entry)
+
+    encoded = [ x.encode('utf8') for x in strings.values ]
+    table = array('I', [ len(strings.values) ])
+    table.extend(len(x) for x in encoded)
+    text = b''.join(encoded)
+    table.append(len(text))
+    table.frombytes(text + bytes(-len(text) % 4))
+
+    payload = array('I', [ len(table) ])
+    payload.extend(table)
+    payload.append(len(head))
+    payload.extend(head)
+    payload.extend(body)
+    if sys.byteorder != 'little':
+        payload.byteswap()
+    payload = payload.tobytes()
+
+    flags = 0
+    if compress:
+        flags |= COMPRESSED
+        payload = zlib.compress(payload)
+    return MAGIC + FORMAT_VERSION.to_bytes(2, 'little') + flags.to_bytes(2, 'little') + payload
+
+
+def _loads_binary(data):
+    version = int.from_bytes(data[8:10], 'little')
+    if version != FORMAT_VERSION:
+        raise ValueError(f'Unsupported format version {version}, expected {FORMAT_VERSION}')
+    flags = int.from_bytes(data[10:12], 'little')
+    payload = data[12:]
+    if flags & COMPRESSED:
+        payload = zlib.decompress(payload)
+
+    words = array('I')
+    words.frombytes(payload[:len(payload) - len(payload) % 4])
+    if sys.byteorder != 'little':
+        words.byteswap()
+
+    # (Strings)
+    size = words[0]
+    count = words[1]
+    lengths = words[2:2 + count]
+    text_size = words[2 + count]
+    start = (3 + count) * 4
+    text = payload[start:start + text_size]
+    values = []
+    offset = 0
+    for length in lengths:
+        values.append(text[offset:offset + length].decode('utf8'))
+        offset += length
+
+    position = 1 + size
+    head_size = words[position]
+    head = iter(words[position + 1:position + 1 + head_size])
+    body = words[position + 1 + head_size:]
+
+    errors = [ values[next(head)] for _ in range(next(head)) ]
+    inferences = [ values[next(head)] for _ in range(next(head)) ]
+
+    kinds, members = [], []
+    for _ in range(next(head)):
+        kind, name, sealed, parent = next(head), values[next(head)], bool(next(head)), next(head)
+        attributes = [ (values[next(head)], next(head)) for _ in range(next(head)) ]
+        methods = []
+        for _ in range(next(head)):
+            name_, return_type, params = values[next(head)], next(head), next(head)
+            methods.append((name_, return_type, [ (values[next(head)], next(head)) for _ in range(params) ]))
+        kinds.append((kind, name, sealed))
+        members.append((parent, attributes, methods))
+
+    context, created = _rebuild_context(kinds)
+
+    def resolve_type(ref):
+        if ref == 0:
+            return None
+        if ref < 4:
+            return SPECIAL[ref]()
+        return created[ref - 4]
+
+    _fill_context(created, members, resolve_type)
+
+    def stream(start, length):
+        def operations():
+            words = body[start:start + length]
+            position = 0
+            while position < length:
+                code = words[position]
+                if code == TOKEN:
+                    kind, lex = words[position + 1], values[words[position + 2]]
+                    if kind == INTEGER:
+                        lex = int(lex)
+                    elif kind == BOOLEAN:
+                        lex = lex == 'True'
+                    yield (TOKEN, lex, values[words[position + 3]], words[position + 4], words[position + 5])
+                    position += 6
+                elif code == NODE:
+                    yield (NODE, NODE_CLASSES[words[position + 1]], words[position + 2], words[position + 3])
+                    position += 4
+                elif code == NONE:
+                    yield (NONE,)
+                    position += 1
+                else:
+                    yield (code, words[position + 1])
+                    position += 2
+        return operations
+
+    streams = [ (values[next(head)], stream(next(head), next(head))) for _ in range(next(head)) ]
+    return TypedProgram(context, errors, inferences, streams, resolve_type)
+
+
+# JSON format
+
+def dumps_json(program, context, errors=(), inferences=(), indent=None):
+    """
+    JSON encoding of the typed `program` and its `context`, for debugging
+    """
+    writer = _Writer(context)
+    type_name = lambda x: None if x is None else x.name
+
+    types = []
+    for kind, typex in _context_types(context):
+        types.append({
+            'kind': kind,
+            'name': typex.name,
+            'sealed': bool(typex.sealed),
+            'parent': type_name(typex.parent),
+            'attributes': [ [ x.name, type_name(x.type) ] for x in typex.attributes ],
+            'methods': [ [ x.name, type_name(x.return_type), [ [ n, type_name(t) ] for n, t in zip(x.param_names, x.param_types) ] ]
+                         for x in typex.methods.values() ],
+        })
+
+    classes = []
+    for declaration in (program.declarations if program is not None else []):
+        operations = []
+        for operation in writer.operations(declaration):
+            code = operation[0]
+            if code == NODE:
+                _, cls, static_type, anchor = operation
+                operations.append([ 'node', cls.__name__, type_name(static_type), anchor ])
+            else:
+                operations.append([ OPERATIONS[code], *operation[1:] ])
+        classes.append({ 'name': declaration.id.lex, 'operations': operations })
+
+    return json.dumps({
+        'format': MAGIC.decode(),
+        'version': FORMAT_VERSION,
+        'errors': list(errors),
+        'inferences': list(inferences),
+        'context': types,
+        'classes': classes,
+    }, indent=indent)
+
+
+def _loads_json(text):
+    data = json.loads(text)
+    if data.get('format') != MAGIC.decode():
+        raise ValueError('Not a serialized COOL program')
+    if data.get('version') != FORMAT_VERSION:
+        raise ValueError(f'Unsupported format version {data.get("version")}, expected {FORMAT_VERSION}')
+
+    context, created = _rebuild_context((x['kind'], x['name'], x['sealed']) for x in data['context'])
+    special = { 'SELF_TYPE': SelfType, 'AUTO_TYPE': AutoType, '<error>': ErrorType }
+
+    def resolve_type(name):
+        if name is None:
+            return None
+        try:
+            return context.types[name]
+        except KeyError:
+            return special[name]()
+
+    members = [ (x['parent'], x['attributes'], x['methods']) for x in data['context'] ]
+    _fill_context(created, members, resolve_type)
+
+    codes = { x: i for i, x in enumerate(OPERATIONS) }
+
+    def stream(operations):
+        def decode():
+            for operation in operations:
+                code = codes[operation[0]]
+                if code == NODE:
+                    yield (NODE, NODE_NAMES[operation[1]], operation[2], operation[3])
+                else:
+                    yield (code, *operation[1:])
+        return decode
+
+    streams = [ (x['name'], stream(x['operations'])) for x in data['classes'] ]
+    return TypedProgram(context, data['errors'], data['inferences'], streams, resolve_type)
+
+
+def loads(data):
+    """
+    TypedProgram from the output of `dumps` or `dumps_json`
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data)
+        if data[:len(MAGIC)] == MAGIC:
+            return _loads_binary(data)
+        data = data.decode('utf8')
+    return _loads_json(data)
+
+
+def dump_result(result, compress=False):
+    """
+    Binary encoding of a cool.pipeline.CompilationResult that got to the check stage
+    """
+    if result.context is None or result.ast is None:
+        raise ValueError(f'The compilation failed at the {result.failed_stage} stage, there is nothing to serialize')
+    return dumps(result.ast, result.context, result.errors, result.inferences, compress)
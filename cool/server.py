@@ -0,0 +1,585 @@
+"""
+Language server for COOL over stdio.
+
+    $ python -m cool.server
+
+Keeps, for every open document, the AST of each class declaration and
+the Context. On every change only the class declarations whose text
+changed are lexed and parsed again; the Context is rebuilt only when the
+names, parents or declared types of the features change, otherwise only
+the changed classes and the classes that read their inferred signatures
+are checked and inferred again. Errors are published as diagnostics and
+the types of declarations and expressions are shown on hover.
+"""
+import contextlib
+import json
+import re
+import sys
+import time
+
+from .ast import *
+from .cmp import Scope, SemanticError, ParsingError, AutoType, VariableInfo
+from .lexer import tokenizer
+from .parser import CoolParser
+from .pipeline import error_position, node_fields
+from .semantic import TypeCollectorVisitor, TypeBuilderVisitor, TypeCheckerVisitor, WorklistTypeInferer
+
+# `class` can only start a class declaration, so the text is split before
+# every one found out of comments and strings (same rules as the lexer,
+# the lookahead skips quickly the positions where nothing can match)
+_SPLIT = re.compile(r'(?=[-("c])(?:--[^\n]*|\(\*.*?\*\)|"[^\0\n"]*(?:\\\n[^\0\n"]*)*"|(?<![A-Za-z0-9_])(c[lL][aA][sS][sS])(?![A-Za-z0-9_]))', re.S)
+_ERROR = re.compile(r'Error on Ln (\d+), Col (\d+): (.*)', re.S)
+_WORD = re.compile(r'[A-Za-z0-9_]+|"[^"\n]*"?|\S')
+
+
+def split_classes(text):
+    """
+    The text as a list of (line, column, text) pieces, each starting at a
+    `class` keyword but the first one
+    """
+    starts = [ 0 ] + [ m.start(1) for m in _SPLIT.finditer(text) if m.group(1) ]
+    if len(starts) > 1 and not text[:starts[1]].strip():
+        del starts[0]
+
+    pieces = []
+    line, position = 1, 0
+    for i, start in enumerate(starts):
+        line += text.count('\n', position, start)
+        column = start - (text.rfind('\n', 0, start) + 1)
+        end = starts[i + 1] if i + 1 < len(starts) else len(text)
+        pieces.append((line, column, text[start:end]))
+        position = start
+    return pieces
+
+
+def parse_error(message):
+    """
+    (line, column, message) of an error message of the pipeline, the errors
+    with no position are put at the start of the document
+    """
+    match = _ERROR.match(message)
+    if match is None:
+        return 1, 0, message
+    return int(match.group(1)), int(match.group(2)), match.group(3)
+
+
+class Segment:
+    """
+    A piece of the document and the class declarations parsed from it.
+    Tokens hold positions in the document, `move` shifts them when the
+    lines before the piece change
+    """
+    def __init__(self, text, line, column):
+        self.text = text
+        self.line = line
+        self.column = column
+        self.declarations = []
+        self.errors = []
+
+        tokens = tokenizer(text)
+        for token in tokens:
+            if token.line == 1:
+                token.column += column
+            token.line += line - 1
+        self.tokens = tokens
+
+        if len(tokens) == 1:
+            return
+        try:
+            self.declarations = CoolParser.evaluate(tokens).declarations
+        except ParsingError as ex:
+            error_line, error_column = error_position(ex.token, tokens)
+            self.errors.append((error_line - line, error_column, ex.text))
+
+    def move(self, line):
+        delta = line - self.line
+        if delta:
+            for token in self.tokens:
+                token.line += delta
+            self.line = line
+
+
+class ClassState:
+    """
+    What is known of a class declaration between changes: its segment,
+    the errors of the checker (lines relative to the segment) and the
+    types whose methods it reads while inferring
+    """
+    __slots__ = ('segment', 'errors', 'reads')
+
+    def __init__(self, segment):
+        self.segment = segment
+        self.errors = []
+        self.reads = set()
+
+
+def fingerprint(declarations):
+    """
+    What the collector and the builder read of the declarations
+    """
+    result = []
+    for declaration in declarations:
+        features = []
+        for feature in declaration.features:
+            if isinstance(feature, AttrDeclaration):
+                features.append((feature.id.lex, feature.type.lex))
+            else:
+                features.append((feature.id.lex, tuple((x.lex, t.lex) for x, t in feature.params), feature.type.lex))
+        result.append((declaration.id.lex, declaration.parent.lex if declaration.parent else None, tuple(features)))
+    return tuple(result)
+
+
+def signature(typex):
+    # (The attribute and method types of `typex`, enough to restore them)
+    return ([ x.type for x in typex.attributes ],
+            [ (x, list(x.param_types), x.return_type, x.param_infos, x.return_info) for x in typex.methods.values() ])
+
+
+def restore(typex, state, fresh=False):
+    attributes, methods = state
+    for attr, attr_type in zip(typex.attributes, attributes):
+        attr.type = attr_type
+    for method, param_types, return_type, param_infos, return_info in methods:
+        method.param_types = list(param_types)
+        method.return_type = return_type
+        if fresh:
+            # (Declared types are restored with new variables to infer, as Method.__init__ does)
+            method.param_infos = [ VariableInfo(f'_{method.name}_{pname}', ptype) for pname, ptype in zip(method.param_names, param_types) ]
+            method.return_info = VariableInfo(f'_{method.name}', return_type)
+        else:
+            method.param_infos = param_infos
+            method.return_info = return_info
+
+
+class Document:
+    def __init__(self, uri, text=''):
+        self.uri = uri
+        self.text = ''
+        self.segments = []
+        self.classes = {}
+        self.context = None
+        self.interface = None
+        self.declared = {}
+        self.inferred = {}
+        self.errors = []
+        self.update(text)
+
+    def update(self, text):
+        """
+        Parses the pieces of `text` that changed and checks the affected
+        classes. Returns the number of classes checked again
+        """
+        self.text = text
+        cache = {}
+        for segment in self.segments:
+            cache.setdefault((segment.text, segment.column), []).append(segment)
+
+        segments = []
+        for line, column, piece in split_classes(text):
+            reused = cache.get((piece, column))
+            if reused:
+                segment = reused.pop(0)
+                segment.move(line)
+            else:
+                segment = Segment(piece, line, column)
+            segments.append(segment)
+        self.segments = segments
+        return self.analyze()
+
+    def analyze(self):
+        declarations = []
+        classes = {}
+        changed = set()
+        for segment in self.segments:
+            for declaration in segment.declarations:
+                declarations.append(declaration)
+                state = self.classes.get(declaration)
+                if state is None:
+                    state = ClassState(segment)
+                    changed.add(declaration)
+                classes[declaration] = state
+        self.classes = classes
+
+        interface = fingerprint(declarations)
+        if interface != self.interface or self.context is None:
+            if not self.build(declarations, interface):
+                for state in classes.values():
+                    state.errors, state.reads = [], set()
+                return 0
+            pending = declarations
+        else:
+            # (Classes that read the signatures of a class checked again are checked again)
+            names = { x.id.lex for x in changed }
+            pending = set(changed)
+            grown = True
+            while grown:
+                grown = False
+                for declaration in declarations:
+                    if declaration not in pending and classes[declaration].reads & names:
+                        pending.add(declaration)
+                        names.add(declaration.id.lex)
+                        grown = True
+            pending = [ x for x in declarations if x in pending ]
+
+        if pending:
+            self.check(pending)
+        return len(pending)
+
+    def build(self, declarations, interface):
+        self.context = None
+        self.interface = interface
+        self.errors = []
+        self.declared, self.inferred = {}, {}
+        if not declarations:
+            return False
+
+        program = Program(declarations)
+        try:
+            collector = TypeCollectorVisitor(self.errors)
+            collector.visit(program)
+            builder = TypeBuilderVisitor(collector.context, self.errors)
+            builder.visit(program)
+        except SemanticError as ex:
+            self.errors.append(ex.text)
+            return False
+
+        self.context = collector.context
+        # (Only the signatures with AUTO_TYPE change while inferring)
+        self.declared = { name: signature(typex) for name, typex in self.context.types.items() if self.infers(typex) }
+        return True
+
+    @staticmethod
+    def infers(typex):
+        if any(isinstance(x.type, AutoType) for x in typex.attributes):
+            return True
+        return any(isinstance(x, AutoType) for method in typex.methods.values() for x in method.param_types + [ method.return_type ])
+
+    def check(self, declarations):
+        context = self.context
+        # (The checker sees the declared signatures of every class)
+        for name, state in self.declared.items():
+            restore(context.types[name], state, fresh=True)
+
+        root = Scope()
+        checker = TypeCheckerVisitor(context)
+        cyclic = False
+        for declaration in declarations:
+            state = self.classes[declaration]
+            checker.errors = []
+            checker.visit(declaration, root.create_child(declaration))
+            state.errors = []
+            for message in checker.errors:
+                line, column, text = parse_error(message)
+                state.errors.append((line - state.segment.line, column, text))
+                cyclic |= 'cyclic heritage' in text
+        if cyclic:
+            # (The checker breaks the cycle in the context, it is built again on the next change)
+            self.interface = None
+
+        # (The inference starts from the inferred signatures of the classes not checked again)
+        names = { x.id.lex for x in declarations }
+        for name, state in self.inferred.items():
+            if name not in names:
+                restore(context.types[name], state)
+
+        owners = {}
+        for typex in context.types.values():
+            for method in typex.methods.values():
+                for var in [ method.return_info ] + method.param_infos:
+                    owners[var] = typex.name
+
+        inferer = WorklistTypeInferer(context, [], [])
+        inferer.infer(Program(declarations), root)
+
+        for declaration in declarations:
+            self.classes[declaration].reads = set()
+        for var, features in inferer.readers.items():
+            owner = owners.get(var)
+            if owner is not None:
+                for i, _ in features:
+                    if declarations[i].id.lex != owner:
+                        self.classes[declarations[i]].reads.add(owner)
+        for name in names:
+            if name in self.declared:
+                self.inferred[name] = signature(context.types[name])
+
+    def diagnostics(self):
+        """
+        (line, column, message) of every error, lines start at 1
+        """
+        result = []
+        for segment in self.segments:
+            result.extend((line + segment.line, column, text) for line, column, text in segment.errors)
+        result.extend(parse_error(x) for x in self.errors)
+        for state in self.classes.values():
+            result.extend((line + state.segment.line, column, text) for line, column, text in state.errors)
+        return result
+
+    def hover(self, line, column):
+        """
+        Text describing the declaration or expression at (line, column),
+        lines start at 1
+        """
+        segment = None
+        for candidate in self.segments:
+            if candidate.line > line:
+                break
+            segment = candidate
+        if segment is None:
+            return None
+
+        for declaration in segment.declarations:
+            for token, text in self.describe(declaration):
+                if token.line == line and token.column <= column < token.column + len(str(token.lex)):
+                    return text
+        return None
+
+    def describe(self, declaration):
+        """
+        Yields the tokens of `declaration` that can be hovered with their text
+        """
+        # (Without a context the reused classes keep the types of the last check, a new document has none)
+        checked = self.context is not None
+        typex = self.context.types.get(declaration.id.lex) if checked else None
+        yield declaration.id, f'class {declaration.id.lex}' + (f' inherits {declaration.parent.lex}' if declaration.parent else '')
+
+        for feature in declaration.features:
+            if isinstance(feature, AttrDeclaration):
+                attr = next((x for x in typex.attributes if x.name == feature.id.lex), None) if typex else None
+                text = self.declared_as(feature.id.lex, feature.type, attr.type if attr else None)
+                yield feature.id, text
+                yield feature.type, text
+                pending = [ feature.expression ]
+            else:
+                method = typex.methods.get(feature.id.lex) if typex else None
+                types = method.param_types if method else [ None ] * len(feature.params)
+                params = []
+                for (idx, ptype), inferred in zip(feature.params, types):
+                    text = self.declared_as(idx.lex, ptype, inferred)
+                    params.append(text.split(' (')[0])
+                    yield idx, text
+                    yield ptype, text
+                return_type = method.return_type if method else None
+                text = self.declared_as(f'{feature.id.lex}({", ".join(params)})', feature.type, return_type)
+                yield feature.id, text
+                yield feature.type, text
+                pending = [ feature.body ]
+
+            # (Explicit stack, expressions can be arbitrarily deep)
+            while pending:
+                node = pending.pop()
+                if isinstance(node, (list, tuple)):
+                    pending.extend(node)
+                    continue
+                if not isinstance(node, Node):
+                    continue
+                if isinstance(node, LetIn):
+                    for idx, ptype, _ in node.let_body:
+                        # (The inferer renames the type token of an inferred variable)
+                        text = self.declared_as(idx.lex, ptype, None, getattr(ptype, 'name', None) if checked else None)
+                        yield idx, text
+                        yield ptype, text
+                elif isinstance(node, CaseOf):
+                    for idx, ptype, _ in node.branches:
+                        yield idx, f'{idx.lex} : {ptype.lex}'
+                static_type = getattr(node, 'static_type', None) if checked else None
+                if static_type is not None:
+                    if isinstance(node, Id):
+                        yield node.token, f'{node.token.lex} : {static_type.name}'
+                    elif isinstance(node, (FunctionCall, MemberCall, Assign)):
+                        yield node.id, f'{node.id.lex} : {static_type.name}'
+                pending.extend(getattr(node, x) for x in node_fields(node.__class__))
+
+    @staticmethod
+    def declared_as(name, typex, inferred, inferred_name=None):
+        if inferred_name is None and inferred is not None:
+            inferred_name = inferred.name
+        if typex.lex == 'AUTO_TYPE' and inferred_name and inferred_name != 'AUTO_TYPE':
+            return f'{name} : {inferred_name} (inferred)'
+        return f'{name} : {typex.lex}'
+
+
+class LanguageServer:
+    """
+    JSON-RPC over `input` and `output` (binary streams) with the
+    Content-Length framing of the Language Server Protocol
+    """
+    def __init__(self, input, output, log=None):
+        self.input = input
+        self.output = output
+        self.log = log
+        self.documents = {}
+        self.running = True
+        self.shutdown = False
+        self.handlers = {
+            'initialize': self.initialize,
+            'shutdown': self.on_shutdown,
+            'exit': self.on_exit,
+            'textDocument/didOpen': self.did_open,
+            'textDocument/didChange': self.did_change,
+            'textDocument/didClose': self.did_close,
+            'textDocument/hover': self.on_hover,
+        }
+
+    def read(self):
+        length = None
+        while True:
+            line = self.input.readline()
+            if not line:
+                return None
+            line = line.strip()
+            if not line:
+                if length is not None:
+                    break
+                continue
+            name, _, value = line.decode('ascii').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        return json.loads(self.input.read(length).decode('utf8'))
+
+    def send(self, message):
+        message['jsonrpc'] = '2.0'
+        body = json.dumps(message).encode('utf8')
+        self.output.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+        self.output.flush()
+
+    def notify(self, method, params):
+        self.send({ 'method': method, 'params': params })
+
+    def serve(self):
+        while self.running:
+            message = self.read()
+            if message is None:
+                break
+            handler = self.handlers.get(message.get('method'))
+            try:
+                result = handler(message.get('params') or {}) if handler is not None else None
+            except Exception as ex:
+                if 'id' in message:
+                    self.send({ 'id': message['id'], 'error': { 'code': -32603, 'message': f'{type(ex).__name__}: {ex}' } })
+                continue
+            if 'id' in message:
+                if handler is None:
+                    self.send({ 'id': message['id'], 'error': { 'code': -32601, 'message': f'Unknown method {message.get("method")}' } })
+                else:
+                    self.send({ 'id': message['id'], 'result': result })
+        return 0 if self.shutdown else 1
+
+    def initialize(self, params):
+        return {
+            'capabilities': {
+                # (Full text on open, incremental changes)
+                'textDocumentSync': { 'openClose': True, 'change': 2 },
+                'hoverProvider': True,
+            },
+            'serverInfo': { 'name': 'cool' },
+        }
+
+    def on_shutdown(self, params):
+        self.shutdown = True
+        return None
+
+    def on_exit(self, params):
+        self.running = False
+
+    def did_open(self, params):
+        document = params['textDocument']
+        start = time.perf_counter()
+        self.documents[document['uri']] = Document(document['uri'], document['text'])
+        self.publish(document['uri'], start)
+
+    def did_change(self, params):
+        uri = params['textDocument']['uri']
+        document = self.documents.get(uri)
+        if document is None:
+            return
+        start = time.perf_counter()
+        text = document.text
+        for change in params['contentChanges']:
+            if 'range' in change:
+                begin = offset(text, change['range']['start'])
+                end = offset(text, change['range']['end'])
+                text = text[:begin] + change['text'] + text[end:]
+            else:
+                text = change['text']
+        checked = document.update(text)
+        self.publish(uri, start, checked)
+
+    def did_close(self, params):
+        uri = params['textDocument']['uri']
+        self.documents.pop(uri, None)
+        self.notify('textDocument/publishDiagnostics', { 'uri': uri, 'diagnostics': [] })
+
+    def on_hover(self, params):
+        document = self.documents.get(params['textDocument']['uri'])
+        if document is None:
+            return None
+        position = params['position']
+        line = position['line']
+        lines = document.text.split('\n')
+        column = column_of(lines[line], position['character']) if line < len(lines) else position['character']
+        text = document.hover(line + 1, column)
+        if text is None:
+            return None
+        return { 'contents': { 'kind': 'markdown', 'value': f'```cool\n{text}\n```' } }
+
+    def publish(self, uri, start, checked=None):
+        document = self.documents[uri]
+        lines = document.text.split('\n')
+        diagnostics = []
+        for line, column, message in document.diagnostics():
+            text = lines[line - 1] if 0 < line <= len(lines) else ''
+            word = _WORD.match(text, column)
+            end = word.end() if word else column + 1
+            diagnostics.append({
+                'range': { 'start': { 'line': line - 1, 'character': character_of(text, column) },
+                           'end': { 'line': line - 1, 'character': character_of(text, end) } },
+                'severity': 1,
+                'source': 'cool',
+                'message': message,
+            })
+        self.notify('textDocument/publishDiagnostics', { 'uri': uri, 'diagnostics': diagnostics })
+        if self.log is not None:
+            elapsed = (time.perf_counter() - start) * 1000
+            checked = '' if checked is None else f', {checked} classes checked'
+            print(f'{uri}: {len(diagnostics)} diagnostics in {elapsed:.1f} ms{checked}', file=self.log, flush=True)
+
+
+# Positions of the protocol count UTF-16 code units, the lexer counts characters
+
+def character_of(line, column):
+    return len(line[:column].encode('utf-16-le')) // 2
+
+
+def column_of(line, character):
+    units = 0
+    for column, char in enumerate(line):
+        if units >= character:
+            return column
+        units += 2 if ord(char) > 0xFFFF else 1
+    return len(line)
+
+
+def offset(text, position):
+    start = 0
+    for _ in range(position['line']):
+        start = text.find('\n', start)
+        if start < 0:
+            return len(text)
+        start += 1
+    end = text.find('\n', start)
+    line = text[start:] if end < 0 else text[start:end]
+    return start + column_of(line, position['character'])
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    log = sys.stderr if '--verbose' in argv else None
+    output = sys.stdout.buffer
+    # the lexer and the parser report on stdout, which is reserved for the protocol
+    with contextlib.redirect_stdout(sys.stderr):
+        return LanguageServer(sys.stdin.buffer, output, log).serve()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
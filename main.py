@@ -3,58 +3,63 @@ import sys
 import streamlit as st
 
 
-from cool.lexer import tokenizer
-from cool.parser import CoolParser
-from cool.cmp import evaluate_reverse_parse
-from cool.semantic import TypeCollectorVisitor, TypeBuilderVisitor, TypeCheckerVisitor, TypeInfererVisitor
+from cool.cache import CompilationCache
 
 st.title("INFERENCIA DE TIPOS PARA COOL")
 st.subheader("Ingrese el código cool a compilar")
 
 text = st.text_area("Código Cool","")
 
-if st.button("Compilar"):    
-    #LEXER
-    tokens = tokenizer(text)
+@st.cache_resource
+def compilation_cache():
+    # compartida por todas las sesiones, COOL_CACHE_DIR la conserva entre reinicios
+    return CompilationCache(cache_dir=os.environ.get('COOL_CACHE_DIR'))
 
-    #PARSING
-    parse, operations = CoolParser(tokens)
-    if not operations:
+def show(entry):
+    stages = [ x['stage'] for x in entry['stages'] if entry['failed_stage'] != x['stage'] ]
+
+    if 'collect' in stages:
+        st.subheader("Primera pasada sobre el AST para crear un contexto y recolectar todos los tipos definidos")
+        st.success("Contexto")
+        st.write(entry['contexts']['collect'])
+
+    if 'build' in stages:
+        st.subheader("Segunda pasada sobre el AST para agregar al contexto la construcción de métodos y atributos")
+        st.success("Contexto")
+        st.write(entry['contexts']['build'])
+
+    if 'check' in stages:
+        st.subheader("Tercera pasada sobre el AST para verificar la consistencia de los tipos en todos los nodos del AST")
+        st.error("Errores detectados en las primeras tres pasadas")
+        for error in entry['errors']:
+            st.write(error)
+
+    if 'infer' in stages:
+        st.subheader("Cuarta pasada sobre el AST para inferir los tipos segun el contexto y el scope")
+        st.warning("Tipos inferidos")
+        for inference in entry['inferences']:
+            st.write(inference)
+
+    return stages
+
+if st.button("Compilar"):
+    cache = compilation_cache()
+    entry, hit = cache.compile(text)
+    stages = show(entry)
+
+    if entry['failed_stage'] == 'parse':
         st.error("PARSING ERROR")
-    
-    #CONSTRUYENDO AST
-    ast = evaluate_reverse_parse(parse, operations, tokens)
-
-    st.subheader("Primera pasada sobre el AST para crear un contexto y recolectar todos los tipos definidos")
-    errors = []
-    a = TypeCollectorVisitor(errors)
-    a.visit(ast)
-    context = a.context
-    strcontext=str(context).split('\n')
-    
-    st.success("Contexto")    
-    st.write(str(context))
-
-    st.subheader("Segunda pasada sobre el AST para agregar al contexto la construcción de métodos y atributos")
-    a = TypeBuilderVisitor(context, errors)    
-    a.visit(ast)
-    st.success("Contexto")
-    st.write(str(context))
-
-    st.subheader("Tercera pasada sobre el AST para verificar la consistencia de los tipos en todos los nodos del AST")
-    a = TypeCheckerVisitor(context, errors)
-    scope = a.visit(ast)    
-    st.error("Errores detectados en las primeras tres pasadas")
-    for error in errors:
-        st.write(error)
-
-    st.subheader("Cuarta pasada sobre el AST para inferir los tipos segun el contexto y el scope")
-    inferences = []
-    a = TypeInfererVisitor(context, errors, inferences)
-    #while a.visit(ast, scope): pass
-    a.visit(ast,scope)
-    st.warning("Tipos inferidos")
-    for inference in inferences:
-        st.write(inference)
-  
-    
\ No newline at end of file
+    # los errores ya se mostraron con la tercera pasada si esta terminó
+    if entry['failed_stage'] and 'check' not in stages:
+        for error in entry['errors']:
+            st.write(error)
+
+    with st.expander("Tiempo por etapa"):
+        if hit:
+            st.write("Resultado tomado de la caché, tiempos de la primera compilación")
+        for stage in entry['stages']:
+            st.write(f"{stage['stage']}: {stage['seconds'] * 1000:.3f} ms, {stage['items']} items, {stage['blocks']} blocks")
+
+    stats = cache.stats()
+    st.caption(f"Caché: {stats['hits']} aciertos en memoria, {stats['disk_hits']} en disco, {stats['misses']} fallos, "
+               f"{stats['entries']} entradas ({stats['bytes'] / 1024:.1f} KiB), {stats['evictions']} descartadas")
@@ -0,0 +1,4 @@
+class Main {
+    g(p1 : AUTO_TYPE) : Int { (case 1 of i : Int => (let v : AUTO_TYPE <- p1 in v); esac) + 1 };
+    main() : Object { g(1) };
+};
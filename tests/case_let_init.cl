@@ -0,0 +1,5 @@
+class Main {
+    a : Int <- 0;
+    f(p0 : Int) : Int { (case p0 of i : Int => (let v : AUTO_TYPE <- p0 in a); o : Object => 0; esac) * 2 };
+    main() : Object { f(1) };
+};
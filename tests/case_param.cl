@@ -0,0 +1,6 @@
+class Main {
+    f(p0 : Int, p2 : AUTO_TYPE) : Int {
+        (case (case p2 of i : Int => p2; o : Object => 0; esac) of i : Int => (let v : AUTO_TYPE <- p2 in p0); o : Object => 0; esac)
+    };
+    main() : Object { f(1, 2) };
+};